@@ -1,11 +1,10 @@
 from mesa import Agent
-import random
 
 class CivilianAgent(Agent):
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.morale_rate=100
-        self.target_area = random.choice(self.model.crowded_areas)
+        self.target_area = self.random.choice(self.model.crowded_areas)
 
     def step(self):
         if self.pos == self.target_area:
@@ -13,45 +12,22 @@ class CivilianAgent(Agent):
         self.move_towards(self.target_area)
 
     def get_new_target_area(self):
-        # Choose a new random crowded area different from the current one
-        new_target = random.choice(self.model.crowded_areas)
+        # Choose a new random crowded area different from the current one, if there is another
+        if len(self.model.crowded_areas) == 1:
+            return self.target_area
+        new_target = self.random.choice(self.model.crowded_areas)
         while new_target == self.target_area:
-            new_target = random.choice(self.model.crowded_areas)
+            new_target = self.random.choice(self.model.crowded_areas)
         return new_target
 
     def move_towards(self, target):
-        # Calculate the next step towards the target
-        next_step = self.get_next_step_towards(target)
-        # Check if the next step is within the grid boundaries
-        if self.model.grid.out_of_bounds(next_step):
+        # Follow the target's flow field, which already routes around danger zones
+        next_step = self.model.navigation.next_step(target, self.pos)
+        if next_step is None:
+            # The target is cut off by danger zones, so head somewhere else
+            self.target_area = self.get_new_target_area()
             return
-        # Check if the cell contains any agents
-        cell_contents = self.model.grid.get_cell_list_contents([next_step])
-        if not cell_contents or not isinstance(cell_contents[0], OrangeCell):
-            self.model.grid.move_agent(self, next_step)
-
-        else:
-            # Find an alternative step
-            self.find_alternative_step(target)
-
-    def find_alternative_step(self, target):
-        possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-        for step in possible_steps:
-            if not self.model.grid.out_of_bounds(step):
-                cell_contents = self.model.grid.get_cell_list_contents([step])
-                if not cell_contents or not isinstance(cell_contents[0], OrangeCell):
-                    self.model.grid.move_agent(self, step)
-                    return
-
-    def get_next_step_towards(self, target):
-        # Get the current position
-        current_pos = self.pos
-        # Calculate the direction to move in
-        direction = (target[0] - current_pos[0], target[1] - current_pos[1])
-        # Normalize the direction to get a step
-        step = (current_pos[0] + (1 if direction[0] > 0 else -1 if direction[0] < 0 else 0),
-                current_pos[1] + (1 if direction[1] > 0 else -1 if direction[1] < 0 else 0))
-        return step
+        self.model.grid.move_agent(self, next_step)
 
     @staticmethod
     def get_distance(pos1, pos2):
@@ -65,45 +41,40 @@ class CivilianAgent(Agent):
             self.pos, moore=True, include_center=False
         )
         # Pick a random position to move to
-        new_position = random.choice(possible_steps)
+        new_position = self.random.choice(possible_steps)
         self.model.grid.move_agent(self, new_position)
 
 
 class MilitaryAgent(Agent):
-    """A military agent forming groups to surround and remove TAgents."""
+    """A military agent hunting TAgents with its squad, to surround and remove them."""
 
     def __init__(self, unique_id, model):
         super().__init__(unique_id, model)
         self.group = []
 
     def step(self):
-        self.form_group()
         target = self.find_terrorist_agent()
         if target:
-            self.move_towards(target)
+            # A squad member heads for its own cell around the target
+            squads = self.model.squads
+            self.move_towards(squads.slot_of(self, target) if squads else target)
             self.check_and_remove_terrorist_agent(target)
 
-    def form_group(self):
-        # Communicate with other MilitaryAgents to form groups of 4
-        neighbors = self.model.grid.get_neighbors(self.pos, moore=True, include_center=False, radius=2)
-        self.group = [agent for agent in neighbors if isinstance(agent, MilitaryAgent)]
-        if len(self.group) < 4:
-            self.group.append(self)
     def find_terrorist_agent(self):
-        # Find the closest TAgent
-        terrorist_agents = [agent for agent in self.model.schedule.agents if isinstance(agent, TerroristAgent)]
-        if terrorist_agents:
-            closest_terrorist_agent = min(terrorist_agents, key=lambda agent: self.get_distance(self.pos, agent.pos))
+        # The squad's TAgent, or the closest one when hunting alone
+        if self.model.squads:
+            return self.model.squads.target_of(self)
+        closest_terrorist_agent = self.model.terrorists.nearest(self.pos)
+        if closest_terrorist_agent:
             return closest_terrorist_agent.pos
         return None
 
     def move_towards(self, target):
         # Calculate the next step towards the target
         next_step = self.get_next_step_towards(target)
-        # Check if the next step is within the grid boundaries and not an OrangeCell
+        # Check if the next step is within the grid boundaries and not a danger zone
         if not self.model.grid.out_of_bounds(next_step):
-            cell_contents = self.model.grid.get_cell_list_contents([next_step])
-            if not any(isinstance(agent, OrangeCell) for agent in cell_contents):
+            if not self.model.danger.is_danger(next_step):
                 self.model.grid.move_agent(self, next_step)
             else:
                 # Find an alternative step
@@ -115,17 +86,15 @@ class MilitaryAgent(Agent):
     def find_alternative_step(self, target):
         possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
         for step in possible_steps:
-            if not self.model.grid.out_of_bounds(step):
-                cell_contents = self.model.grid.get_cell_list_contents([step])
-                if not any(isinstance(agent, OrangeCell) for agent in cell_contents):
-                    self.model.grid.move_agent(self, step)
-                    return
+            if not self.model.grid.out_of_bounds(step) and not self.model.danger.is_danger(step):
+                self.model.grid.move_agent(self, step)
+                return
 
     def random_move(self):
         possible_steps = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False)
-        valid_steps = [step for step in possible_steps if not self.model.grid.out_of_bounds(step) and not any(isinstance(agent, OrangeCell) for agent in self.model.grid.get_cell_list_contents([step]))]
+        valid_steps = [step for step in possible_steps if not self.model.grid.out_of_bounds(step) and not self.model.danger.is_danger(step)]
         if valid_steps:
-            next_step = random.choice(valid_steps)
+            next_step = self.random.choice(valid_steps)
             self.model.grid.move_agent(self, next_step)
 
     def get_next_step_towards(self, target):
@@ -140,14 +109,12 @@ class MilitaryAgent(Agent):
 
     def check_and_remove_terrorist_agent(self, target):
         # Check if the TAgent is surrounded by 4 MilitaryAgents
-        neighbors = self.model.grid.get_neighbors(target, moore=True, include_center=False, radius=1)
-        military_agents = [agent for agent in neighbors if isinstance(agent, MilitaryAgent)]
-        if len(military_agents) >= 4:
+        ring = self.model.grid.get_neighborhood(target, moore=True, include_center=False)
+        if sum(self.model.occupancy.military_count(pos) for pos in ring) >= 4:
             # Remove the TAgent
             terrorist_agent = [agent for agent in self.model.grid.get_cell_list_contents([target]) if isinstance(agent, TerroristAgent)]
             if terrorist_agent:
-                self.model.grid.remove_agent(terrorist_agent[0])
-                self.model.schedule.remove(terrorist_agent[0])
+                self.model.remove_agent(terrorist_agent[0], "military")
 
     @staticmethod
     def get_distance(pos1, pos2):
@@ -168,34 +135,19 @@ class TerroristAgent(Agent):
         self.check_and_remove_agents()
 
     def update_target(self):
-        # Create dictionaries to count civilians and military agents in each cell
-        civilian_counts = {}
-        military_counts = {}
-        for agent in self.model.schedule.agents:
-            if isinstance(agent, CivilianAgent):
-                pos = agent.pos
-                if pos in civilian_counts:
-                    civilian_counts[pos] += 1
-                else:
-                    civilian_counts[pos] = 1
-            elif isinstance(agent, MilitaryAgent):
-                pos = agent.pos
-                if pos in military_counts:
-                    military_counts[pos] += 1
-                else:
-                    military_counts[pos] = 1
-            # Find positions with more civilians and less than 4 military agents
-        potential_targets = [pos for pos, count in civilian_counts.items() if count > 0 and military_counts.get(pos, 0) < 4]
-
-        # Communicate with other TAgents to distribute themselves
-        occupied_positions = [agent.target for agent in self.model.schedule.agents if isinstance(agent, TerroristAgent) and agent.target]
-        potential_targets = [pos for pos in potential_targets if pos not in occupied_positions]
-
-        if potential_targets:
-            # Find the closest potential target
-            self.target = min(potential_targets, key=lambda pos: self.get_distance(self.pos, pos))
-        else:
-            self.target = None
+        if self.model.targeting != "sequential":
+            # The model has already handed out this step's targets
+            return
+        # Find positions with civilians, less than 4 military agents and not targeted by other TAgents
+        self.set_target(self.model.occupancy.closest_target(self.pos, self.get_distance))
+
+    def set_target(self, new_target):
+        occupancy = self.model.occupancy
+        if self.target:
+            occupancy.release(self.target)
+        if new_target:
+            occupancy.claim(new_target)
+        self.target = new_target
 
     def move_towards_target(self):
         # Calculate the next step towards the target
@@ -214,29 +166,20 @@ class TerroristAgent(Agent):
         return step
 
     def check_and_remove_agents(self):
-        # Get the 24 closest cells around the agent
-        neighbors = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=False, radius=2)
-        close_neighbors = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=True, radius=1)
-
         # Count the number of first and second type agents in the 24 closest cells
-        count = 0
-        for neighbor in neighbors:
-            cell_agents = self.model.grid.get_cell_list_contents([neighbor])
-            for agent in cell_agents:
-                if isinstance(agent, (CivilianAgent, MilitaryAgent)):
-                    count += 1
+        count = self.model.density.crowd_around(self.pos)
 
         # If more than 14 out of 24 cells are occupied by first or second type agents
         if count > 14:
             # Remove agents in the closest 8 cells
+            close_neighbors = self.model.grid.get_neighborhood(self.pos, moore=True, include_center=True, radius=1)
             for neighbor in close_neighbors:
                 cell_agents = self.model.grid.get_cell_list_contents([neighbor])
                 for agent in cell_agents:
                     if isinstance(agent, (CivilianAgent, MilitaryAgent)):
-                        self.model.grid.remove_agent(agent)
-                        self.model.schedule.remove(agent)
-                # Color the cell orange
-                self.model.grid.place_agent(OrangeCell(neighbor), neighbor)
+                        self.model.remove_agent(agent, "blast")
+            # Mark the blast area as a danger zone
+            self.model.create_danger_zones(close_neighbors)
 
     @staticmethod
     def get_distance(pos1, pos2):
@@ -244,6 +187,9 @@ class TerroristAgent(Agent):
         return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
 
 class OrangeCell(Agent):
-    """An agent representing an orange-colored cell."""
+    """A danger zone cell, as drawn by the visualization and counted by count_type.
+
+    Danger zones live in the model's DangerLayer rather than on the grid.
+    """
     def __init__(self, pos):
         self.pos = pos
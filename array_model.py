@@ -0,0 +1,299 @@
+import numpy as np
+from mesa import Model
+from mesa.time import BaseScheduler
+
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent
+from danger import DangerLayer
+from density import BLAST_TRIGGER_OFFSETS, cell_counts, wrapped_box_sum
+from navigation import Navigation, UNREACHABLE
+from targeting import greedy_assignment, nearest_source
+from collection import StreamCollector
+from reporting import DEFAULT_SINKS, make_sinks
+from seeding import fresh_seed
+from model import WarZoneModel, AGENT_LABELS, CROWDED_AREAS, HIGH_VALUE_AREAS, scale_areas
+
+DEAD, CIVILIAN, MILITARY, TERRORIST = -1, 0, 1, 2
+AGENT_TYPES = {CIVILIAN: CivilianAgent, MILITARY: MilitaryAgent, TERRORIST: TerroristAgent}
+
+# Moore neighbourhood in the order Grid.get_neighborhood lists it away from the edges
+MOORE_OFFSETS = np.array([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# The 9 cells a blast covers
+BLAST_OFFSETS = np.array([(dx, dy) for dx in range(-1, 2) for dy in range(-1, 2)])
+# Largest map whose civilians follow flow fields unless navigation says otherwise; building
+# them takes a few seconds at this size and grows with the map
+NAVIGATION_MAX_CELLS = 128 * 128
+
+
+def steps_towards(x, y, target_x, target_y):
+    # Same rule as get_next_step_towards: one cell along each axis, no wrapping
+    return x + np.sign(target_x - x), y + np.sign(target_y - y)
+
+
+def avoid_danger(x, y, next_x, next_y, width, height, is_danger):
+    """Replace steps into danger zones with the first safe neighbouring cell, or staying put.
+
+    is_danger(x, y) says which of the given cells are danger zones.
+    """
+    next_x, next_y = next_x % width, next_y % height
+    blocked = is_danger(next_x, next_y)
+    if blocked.any():
+        around_x = (x[blocked, None] + MOORE_OFFSETS[:, 0]) % width
+        around_y = (y[blocked, None] + MOORE_OFFSETS[:, 1]) % height
+        safe = ~is_danger(around_x, around_y)
+        first = safe.argmax(axis=1)
+        rows = np.arange(len(first))
+        has_safe = safe.any(axis=1)
+        next_x[blocked] = np.where(has_safe, around_x[rows, first], x[blocked])
+        next_y[blocked] = np.where(has_safe, around_y[rows, first], y[blocked])
+    return next_x, next_y
+
+
+def pick_other_area(area, chosen, areas, rng):
+    """Send the chosen civilians to a random crowded area other than their own, out of areas."""
+    # With a single crowded area there is no other to pick
+    if chosen.any() and areas > 1:
+        new_area = rng.integers(0, areas - 1, np.count_nonzero(chosen))
+        area[chosen] = new_area + (new_area >= area[chosen])
+
+
+def civilian_steps(x, y, area, crowded_areas, navigation, rng, width, height, is_danger):
+    """Where civilians at (x, y) heading for area step next, as CivilianAgent moves.
+
+    Civilians that reached their area, or are cut off from it by danger zones,
+    pick another one; area is updated in place. Without a navigation they
+    step straight for their area around danger zones.
+    """
+    positions = np.array(crowded_areas)
+    pick_other_area(area, (x == positions[area, 0]) & (y == positions[area, 1]), len(crowded_areas), rng)
+    if navigation:
+        next_cell = navigation.next_table(crowded_areas)[area, x * height + y]
+        # Civilians cut off from their area by danger zones head somewhere else instead
+        stuck = next_cell == UNREACHABLE
+        pick_other_area(area, stuck, len(crowded_areas), rng)
+        return np.divmod(np.where(stuck, x * height + y, next_cell), height)
+    return avoid_danger(x, y, *steps_towards(x, y, positions[area, 0], positions[area, 1]), width, height,
+                        is_danger)
+
+
+def ring_replay(hunted, delta, rng):
+    """Replay soldiers' steps into (delta 1) and out of (-1) the ring around the terrorist each hunts.
+
+    Soldiers check their target right after their own move, so with
+    sequential activation a ring can be full for a moment before its soldiers
+    close in on the centre. Each terrorist's hunters are replayed in a random
+    order; returns the hunted terrorists, the largest change in their ring
+    along the way, and the change in all.
+    """
+    order = np.lexsort((rng.random(len(hunted)), hunted))
+    targets, starts, lengths = np.unique(hunted[order], return_index=True, return_counts=True)
+    delta = delta[order]
+    total = np.cumsum(delta)
+    # Change in ring size after each hunter's move, relative to before that terrorist's first hunter
+    change = total - np.repeat(total[starts] - delta[starts], lengths)
+    return targets, np.maximum.reduceat(change, starts), change[starts + lengths - 1]
+
+
+def in_ring(x, y, centre_x, centre_y, width, height):
+    """Whether each (x, y) is one of the 8 cells around its centre cell on the torus."""
+    dx = np.abs(x - centre_x) % width
+    dy = np.abs(y - centre_y) % height
+    dx = np.minimum(dx, width - dx)
+    dy = np.minimum(dy, height - dy)
+    return np.maximum(dx, dy) == 1
+
+
+class ArraySchedule(BaseScheduler):
+    """Activates every agent of an ArrayWarZoneModel once, population by population."""
+
+    def step(self):
+        self.model.advance_agents()
+        super().step()
+
+    def get_agent_count(self):
+        return int(np.count_nonzero(self.model.kind != DEAD))
+
+
+class ArrayWarZoneModel(Model):
+    """WarZoneModel with its agents held in NumPy arrays instead of Agent objects.
+
+    Each step applies the agent classes' rules to a whole population at once,
+    so results match the object engine statistically rather than move for move.
+    Agents are dealt into random sub-rounds, and within each sub-round the
+    populations take turns in a random order, standing in for RandomActivation's
+    shuffled agent order. Civilians follow flow fields around danger zones on
+    maps of up to NAVIGATION_MAX_CELLS cells, and step greedily around them
+    on larger ones; navigation=True or False overrides that.
+    """
+    def __init__(self, num_civilians, num_military, num_terrorists, width=30, height=30,
+                 crowded_areas=None, high_value_areas=None, seed=None, sub_rounds=4, max_assignment_rounds=8,
+                 navigation=None, show_report=True, collector=None, report_sinks=None):
+        self.num_civilians = num_civilians
+        self.num_military = num_military
+        self.num_terrorists = num_terrorists
+        self.width = width
+        self.height = height
+        self.seed = seed if seed is not None else fresh_seed()
+        self.rng = np.random.default_rng(self.seed)
+        self.schedule = ArraySchedule(self)
+        self.running = True
+        self.show_report = show_report
+        self.report_sinks = make_sinks(DEFAULT_SINKS if report_sinks is None else report_sinks)
+        self.sub_rounds = sub_rounds
+        self.max_assignment_rounds = max_assignment_rounds
+
+        self.crowded_areas = crowded_areas or scale_areas(CROWDED_AREAS, width, height)
+        self.high_value_areas = high_value_areas or scale_areas(HIGH_VALUE_AREAS, width, height)
+
+        self.initial_civilians = num_civilians
+        self.initial_military = num_military
+        self.initial_terrorists = num_terrorists
+
+        self.danger_zones_created = 0
+
+        self.population = {CivilianAgent: num_civilians, MilitaryAgent: num_military,
+                           TerroristAgent: num_terrorists}
+        self.danger = DangerLayer(width, height)
+        # Flow fields cost a breadth-first search per crowded area up front, so unless told
+        # otherwise larger maps fall back to greedy steps around danger zones
+        if navigation is None:
+            navigation = width * height <= NAVIGATION_MAX_CELLS
+        self.navigation = Navigation(width, height, self.danger) if navigation else None
+        if self.navigation:
+            self.navigation.precompute(self.crowded_areas + self.high_value_areas)
+
+        # One row per agent, in the same id order as the object engine
+        total = num_civilians + num_military + num_terrorists
+        self.unique_id = np.arange(total)
+        self.kind = np.repeat(np.array([CIVILIAN, MILITARY, TERRORIST], dtype=np.int8),
+                              [num_civilians, num_military, num_terrorists])
+        self.x = self.rng.integers(0, width, total)
+        self.y = self.rng.integers(0, height, total)
+        self.morale = np.where(self.kind == CIVILIAN, 100, 0)
+        # Civilians head for a crowded area, terrorists for a target cell (-1 when they have none)
+        self.target_area = np.where(self.kind == CIVILIAN,
+                                    self.rng.integers(0, len(self.crowded_areas), total), -1)
+        self.target_x = np.full(total, -1)
+        self.target_y = np.full(total, -1)
+
+        self.datacollector = collector or StreamCollector()
+
+        self.report = None
+
+    def step(self):
+        # Targets are assigned inside each sub-round, so there is no separate phase for them
+        self.datacollector.collect(self)
+        self.schedule.step()
+        self.check_for_report()
+
+    check_for_report = WarZoneModel.check_for_report
+    generate_report = WarZoneModel.generate_report
+    count_type = staticmethod(WarZoneModel.count_type)
+    populations = WarZoneModel.populations
+    civilian_casualties = WarZoneModel.civilian_casualties
+    military_casualties = WarZoneModel.military_casualties
+    terrorist_casualties = WarZoneModel.terrorist_casualties
+
+    def advance_agents(self):
+        # Split the agents into random sub-rounds so the populations interleave
+        # the way shuffled one-at-a-time activation interleaves them
+        sub_round = self.rng.integers(0, self.sub_rounds, len(self.kind))
+        phases = [self.move_civilians, self.move_military, self.move_terrorists]
+        for current in range(self.sub_rounds):
+            self.active = sub_round == current
+            for index in self.rng.permutation(len(phases)):
+                phases[index]()
+        keep = self.kind != DEAD
+        for name in ("unique_id", "kind", "x", "y", "morale", "target_area", "target_x", "target_y"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def members(self, kind, active=False):
+        if active:
+            return np.flatnonzero((self.kind == kind) & self.active)
+        return np.flatnonzero(self.kind == kind)
+
+    def move_civilians(self):
+        civilians = self.members(CIVILIAN, active=True)
+        area = self.target_area[civilians]
+        self.x[civilians], self.y[civilians] = civilian_steps(
+            self.x[civilians], self.y[civilians], area, self.crowded_areas, self.navigation, self.rng,
+            self.width, self.height, self.is_danger)
+        self.target_area[civilians] = area
+
+    def move_military(self):
+        military = self.members(MILITARY, active=True)
+        terrorists = self.members(TERRORIST)
+        if not len(military) or not len(terrorists):
+            return
+        label, _ = nearest_source(self.width, self.height, self.x[terrorists], self.y[terrorists])
+        x, y = self.x[military], self.y[military]
+        hunted = terrorists[label[x, y]]
+        next_x, next_y = steps_towards(x, y, self.x[hunted], self.y[hunted])
+        self.x[military], self.y[military] = avoid_danger(x, y, next_x, next_y, self.width, self.height,
+                                                          self.is_danger)
+
+        # A terrorist goes once the ring around it held at least 4 military agents
+        was_around = in_ring(x, y, self.x[hunted], self.y[hunted], self.width, self.height)
+        is_around = in_ring(self.x[military], self.y[military], self.x[hunted], self.y[hunted],
+                            self.width, self.height)
+        targets, peak, change = ring_replay(hunted, is_around.astype(np.int64) - was_around, self.rng)
+        everyone = self.members(MILITARY)
+        counts = cell_counts(self.x[everyone], self.y[everyone], self.width, self.height)
+        surrounding = (wrapped_box_sum(counts, 1) - counts)[self.x[targets], self.y[targets]]
+        self.remove(targets[surrounding - change + peak >= 4], "military")
+
+    def move_terrorists(self):
+        terrorists = self.members(TERRORIST, active=True)
+        self.assign_targets(terrorists)
+        moving = terrorists[self.target_x[terrorists] >= 0]
+        next_x, next_y = steps_towards(self.x[moving], self.y[moving],
+                                       self.target_x[moving], self.target_y[moving])
+        self.x[moving] = next_x % self.width
+        self.y[moving] = next_y % self.height
+        self.detonate(terrorists)
+
+    def assign_targets(self, terrorists):
+        civilians = self.members(CIVILIAN)
+        military = self.members(MILITARY)
+        civilian_counts = cell_counts(self.x[civilians], self.y[civilians], self.width, self.height)
+        military_counts = cell_counts(self.x[military], self.y[military], self.width, self.height)
+        candidates = (civilian_counts > 0) & (military_counts < 4)
+        # Cells other terrorists are heading for, and our own last targets, are taken,
+        # as they are for the agent classes
+        claimed = self.members(TERRORIST)
+        claimed = claimed[self.target_x[claimed] >= 0]
+        candidates[self.target_x[claimed], self.target_y[claimed]] = False
+        self.target_x[terrorists], self.target_y[terrorists] = greedy_assignment(
+            self.width, self.height, self.x[terrorists], self.y[terrorists], candidates, self.max_assignment_rounds)
+
+    def detonate(self, terrorists):
+        people = np.flatnonzero((self.kind == CIVILIAN) | (self.kind == MILITARY))
+        counts = cell_counts(self.x[people], self.y[people], self.width, self.height)
+        density = wrapped_box_sum(counts, 2) - counts
+        triggered = terrorists[density[self.x[terrorists], self.y[terrorists]] > 14]
+        if not len(triggered):
+            return
+        blasted = np.zeros_like(self.danger.cells)
+        for terrorist in self.rng.permutation(triggered):
+            x, y = self.x[terrorist], self.y[terrorist]
+            # Recount, since earlier blasts this step may have thinned the crowd
+            if counts[(x + BLAST_TRIGGER_OFFSETS[:, 0]) % self.width,
+                      (y + BLAST_TRIGGER_OFFSETS[:, 1]) % self.height].sum() <= 14:
+                continue
+            footprint = ((x + BLAST_OFFSETS[:, 0]) % self.width, (y + BLAST_OFFSETS[:, 1]) % self.height)
+            counts[footprint] = 0
+            blasted[footprint] = True
+        fresh = self.danger.stamp(np.argwhere(blasted))
+        if self.navigation:
+            self.navigation.block(fresh)
+        self.danger_zones_created = self.danger.count
+        self.remove(people[blasted[self.x[people], self.y[people]]], "blast")
+
+    def is_danger(self, x, y):
+        return self.danger.cells[x, y]
+
+    def remove(self, indices, cause):
+        for kind, x, y in zip(self.kind[indices].tolist(), self.x[indices].tolist(), self.y[indices].tolist()):
+            agent_type = AGENT_TYPES[kind]
+            self.population[agent_type] -= 1
+            self.datacollector.record_casualty(self.schedule.steps, AGENT_LABELS[agent_type], (x, y), cause)
+        self.kind[indices] = DEAD
@@ -0,0 +1,154 @@
+import argparse
+import itertools
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from collection import CASUALTY_COLUMNS, POPULATION_COLUMNS, StreamCollector
+from columnar import ColumnarStore, rows_to_columns
+from engines import ENGINES, create_model
+from seeding import replica_seeds
+
+
+def parameter_grid(num_civilians, num_military, num_terrorists, seeds):
+    """Every combination of the given population sizes and seeds, one dict per run.
+
+    run_id is made of the parameters and the seed alone, so a sweep that is
+    started again skips every run it has a result for. The engine and
+    max_steps are the same for a whole results directory.
+    """
+    return [
+        {"run_id": f"{civilians}-{military}-{terrorists}-{seed}", "num_civilians": civilians,
+         "num_military": military, "num_terrorists": terrorists, "seed": seed}
+        for civilians, military, terrorists, seed
+        in itertools.product(num_civilians, num_military, num_terrorists, seeds)
+    ]
+
+
+def flatten_report(report):
+    """Flatten the nested report into "Section/Item" columns with numeric values where possible."""
+    row = {}
+    for section, items in report.items():
+        for item, value in items.items():
+            if value == "N/A":
+                value = math.nan
+            elif isinstance(value, str) and value.isdigit():
+                value = int(value)
+            row[f"{section}/{item}"] = value
+    return row
+
+
+def run_one(run, max_steps, engine):
+    """Run one headless model to completion or max_steps.
+
+    Returns its report row, its population time series and its casualty ledger.
+    """
+    # Room for every step and every agent's death, so the stored tables are complete
+    agents = run["num_civilians"] + run["num_military"] + run["num_terrorists"]
+    collector = StreamCollector(history=max_steps + 1, casualty_history=max(agents, 1))
+    model = create_model(run["num_civilians"], run["num_military"], run["num_terrorists"],
+                         engine=engine, seed=run["seed"], show_report=False, collector=collector)
+    while model.running and model.schedule.steps < max_steps:
+        model.step()
+    finished = not model.running
+    if not finished:
+        # Hit the step limit: report on the state the run got to
+        model.generate_report()
+    row = dict(run, engine=engine, max_steps=max_steps, steps=model.schedule.steps, finished=finished)
+    row.update(flatten_report(model.report))
+    series = {column: collector.populations.column(column).tolist() for column in POPULATION_COLUMNS}
+    series["run_id"] = [run["run_id"]] * len(series["step"])
+    casualties = {column: collector.casualty_ledger.column(column).tolist()
+                  for column in CASUALTY_COLUMNS}
+    casualties["run_id"] = [run["run_id"]] * len(casualties["step"])
+    return row, series, casualties
+
+
+def completed_runs(store, engine, max_steps):
+    """run_ids already in store, which must hold runs of engine with max_steps only."""
+    recorded = store.read("runs", columns=["run_id", "engine", "max_steps"])
+    for name, value in (("engine", engine), ("max_steps", max_steps)):
+        others = set(recorded.get(name, [])) - {value}
+        if others:
+            raise ValueError(f"{store.directory} holds runs with {name} {sorted(others)[0]}, not {value}; "
+                             f"use another results directory")
+    return set(recorded.get("run_id", []))
+
+
+def worker_pool(processes=None, start_method=None, engine="object"):
+    """A process pool for runs of engine, started with start_method.
+
+    By default workers are forked where that is the platform's default.
+    Where it would spawn them instead, and a forkserver is available, they
+    are forked from a forkserver that imported the headless core once, so a
+    new worker costs a fork rather than a fresh interpreter importing NumPy
+    and mesa.
+    """
+    if start_method is None:
+        start_method = multiprocessing.get_start_method()
+        if start_method == "spawn" and "forkserver" in multiprocessing.get_all_start_methods():
+            start_method = "forkserver"
+    context = multiprocessing.get_context(start_method)
+    if start_method == "forkserver":
+        context.set_forkserver_preload(["batch", ENGINES[engine][0]])
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count(), mp_context=context)
+
+
+def run_sweep(runs, results, max_steps=1000, engine="object", processes=None, flush_every=100, start_method=None):
+    """Run every run on a process pool, streaming results into a ColumnarStore at results.
+
+    Runs already recorded in results are skipped, so an interrupted sweep
+    picks up where it stopped when started again with the same arguments.
+    A results directory holding runs of another engine or max_steps is
+    refused rather than mixed with them.
+    """
+    store = ColumnarStore(results)
+    done = completed_runs(store, engine, max_steps)
+    pending = [run for run in runs if run["run_id"] not in done]
+    print(f"{len(runs) - len(pending)} of {len(runs)} runs already done, {len(pending)} to go")
+
+    rows, series, casualties = [], [], []
+
+    def concatenate(parts):
+        return {key: list(itertools.chain.from_iterable(part[key] for part in parts)) for key in parts[0]}
+
+    def flush():
+        if rows:
+            store.write_chunk({"runs": rows_to_columns(rows), "series": concatenate(series),
+                               "casualties": concatenate(casualties)})
+            rows.clear()
+            series.clear()
+            casualties.clear()
+
+    with worker_pool(processes, start_method, engine) as executor:
+        futures = [executor.submit(run_one, run, max_steps, engine) for run in pending]
+        for count, future in enumerate(as_completed(futures), 1):
+            row, run_series, run_casualties = future.result()
+            rows.append(row)
+            series.append(run_series)
+            casualties.append(run_casualties)
+            if len(rows) >= flush_every:
+                flush()
+                print(f"{count}/{len(pending)} runs done")
+    flush()
+    return store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a headless WarZoneModel parameter sweep on all cores.")
+    parser.add_argument("results", help="directory for the columnar results; reused to resume a sweep")
+    parser.add_argument("--civilians", type=int, nargs="+", default=[100])
+    parser.add_argument("--military", type=int, nargs="+", default=[50])
+    parser.add_argument("--terrorists", type=int, nargs="+", default=[20])
+    parser.add_argument("--seeds", type=int, default=10, help="number of replicas per parameter combination")
+    parser.add_argument("--seed", type=int, default=0, help="root seed the replica seeds are derived from")
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="object")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--start-method", choices=multiprocessing.get_all_start_methods(),
+                        help="how workers are started; the platform's default, or forkserver in place of spawn")
+    args = parser.parse_args()
+    runs = parameter_grid(args.civilians, args.military, args.terrorists, replica_seeds(args.seed, args.seeds))
+    run_sweep(runs, args.results, args.max_steps, args.engine, args.processes, args.flush_every, args.start_method)
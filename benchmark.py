@@ -0,0 +1,260 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import mesa
+import numpy as np
+
+from model import WarZoneModel
+
+# Slider maxima in server.py
+SLIDER_LIMITS = {"num_civilians": 200, "num_military": 100, "num_terrorists": 50}
+
+
+def case(name, factor=1, width=30, height=30, danger=0.0, sparse=False):
+    """One benchmark scenario: the slider maxima times factor, on a width x height map
+    with a danger fraction of its cells already marked as danger zones."""
+    counts = {key: limit * factor for key, limit in SLIDER_LIMITS.items()}
+    return dict(name=name, width=width, height=height, danger=danger, sparse=sparse, **counts)
+
+
+# Populations beyond the sliders, maps beyond 30x30 at the default crowding, and danger density
+SUITE = [
+    case("default"),
+    case("population-x4", factor=4),
+    case("population-x16", factor=16),
+    case("map-60", factor=4, width=60, height=60),
+    case("map-120", factor=16, width=120, height=120),
+    case("danger-10", danger=0.1),
+    case("danger-30", danger=0.3),
+    case("sparse-2000", factor=16, width=2000, height=2000, sparse=True),
+]
+
+# Modules a headless worker imports, then the browser front end for comparison
+STARTUP_MODULES = ["model", "engines", "batch", "server"]
+# Modules a headless run shouldn't load
+GUI_MODULES = ["tkinter", "report_element", "mesa.visualization"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, *[name for name in {gui!r} if name in sys.modules])
+"""
+
+# Starts a pool of workers and waits until each has finished a one-step run, or with
+# method None makes the same runs in this process
+SPAWN_SCRIPT = """
+import time
+start = time.perf_counter()
+from batch import run_one, worker_pool
+runs = [dict(run_id=index, num_civilians=10, num_military=5, num_terrorists=2, seed=index)
+        for index in range({workers})]
+arguments = (run_one, runs, [1] * len(runs), ["object"] * len(runs))
+if {method!r} is None:
+    list(map(*arguments))
+else:
+    with worker_pool({workers}, {method!r}) as executor:
+        list(executor.map(*arguments))
+print(time.perf_counter() - start)
+"""
+
+
+def run_script(script):
+    # A fresh interpreter each time, so nothing is imported already
+    return subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                          check=True, capture_output=True, text=True).stdout.split()
+
+
+def startup(workers, repeats):
+    """Import time of each of STARTUP_MODULES, and how long a pool of workers takes to
+    return its first results with each start method; best of repeats fresh interpreters.
+
+    The in-process row is the same runs without a pool, the part of each
+    pool's time that isn't starting workers.
+    """
+    print(f"{'import':<11} {'ms':>8}  GUI modules loaded")
+    for module in STARTUP_MODULES:
+        runs = [run_script(IMPORT_SCRIPT.format(module=module, gui=GUI_MODULES)) for _ in range(repeats)]
+        print(f"{module:<11} {min(float(run[0]) for run in runs) * 1000:>8.1f}  {' '.join(runs[0][1:]) or '-'}")
+    print(f"{'start':<11} {'ms':>8}  for {workers} workers")
+    for method in [None] + multiprocessing.get_all_start_methods():
+        seconds = min(float(run_script(SPAWN_SCRIPT.format(workers=workers, method=method))[0])
+                      for _ in range(repeats))
+        print(f"{method or 'in-process':<11} {seconds * 1000:>8.1f}")
+
+
+def time_steps(num_civilians, num_military, num_terrorists, steps, seed):
+    """Average wall time of one model step, in seconds."""
+    model = WarZoneModel(num_civilians, num_military, num_terrorists, seed=seed, show_report=False)
+    start = time.perf_counter()
+    done = 0
+    while done < steps and model.running:
+        model.step()
+        done += 1
+    return (time.perf_counter() - start) / max(done, 1)
+
+
+def scaling(factors, steps, seed):
+    print(f"{'scale':>6} {'civilians':>10} {'military':>9} {'terrorists':>11} {'ms/step':>9} {'growth':>7}")
+    previous = None
+    for factor in factors:
+        counts = {name: limit * factor for name, limit in SLIDER_LIMITS.items()}
+        seconds = time_steps(steps=steps, seed=seed, **counts)
+        growth = f"{seconds / previous:.2f}x" if previous else "-"
+        print(f"{factor:>6} {counts['num_civilians']:>10} {counts['num_military']:>9} "
+              f"{counts['num_terrorists']:>11} {seconds * 1000:>9.2f} {growth:>7}")
+        previous = seconds
+
+
+def build_model(scenario, seed, profile=False):
+    # Danger zones go down before the agents, so nobody starts stuck on one
+    danger_zones = None
+    if scenario["danger"]:
+        cells = [(x, y) for x in range(scenario["width"]) for y in range(scenario["height"])]
+        danger_zones = random.Random(seed).sample(cells, int(len(cells) * scenario["danger"]))
+    return WarZoneModel(scenario["num_civilians"], scenario["num_military"], scenario["num_terrorists"],
+                        seed=seed, show_report=False, width=scenario["width"], height=scenario["height"],
+                        profile=profile, sparse=scenario.get("sparse", False), danger_zones=danger_zones)
+
+
+def fingerprint(model):
+    """A digest of the model's state that only bit-identical trajectories share."""
+    state = (model.schedule.steps, sorted((agent.unique_id, agent.pos) for agent in model.schedule.agents),
+             model.danger.positions(), model.datacollector.summary, model.random.getstate())
+    return hashlib.sha256(repr(state).encode()).hexdigest()[:16]
+
+
+def run_steps(model, steps):
+    done = 0
+    while done < steps and model.running:
+        model.step()
+        done += 1
+    return done
+
+
+def measure(scenario, steps, seed, repeats=3):
+    """Init time, step throughput, per-phase time and peak memory of one scenario.
+
+    Times are the best of repeats identical runs, which filters out most of the
+    noise from other work on the machine.
+    """
+    init_seconds = step_seconds = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model = build_model(scenario, seed)
+        init_seconds = min(init_seconds, time.perf_counter() - start)
+        start = time.perf_counter()
+        done = run_steps(model, steps)
+        step_seconds = min(step_seconds, time.perf_counter() - start)
+    digest = fingerprint(model)
+
+    # Phase timing and memory tracing slow the model down, so each gets a run of its own
+    model = build_model(scenario, seed, profile=True)
+    run_steps(model, steps)
+    phases = model.profiler.totals()
+    tracemalloc.start()
+    model = build_model(scenario, seed)
+    run_steps(model, steps)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return dict(scenario, seed=seed, repeats=repeats, steps=done, init_seconds=init_seconds,
+                step_seconds=step_seconds, steps_per_second=done / step_seconds if step_seconds else None,
+                peak_memory_bytes=peak_memory, phases=phases, fingerprint=digest)
+
+
+def run_suite(scenarios, steps, seed, output, repeats=3):
+    results = []
+    print(f"{'case':<16} {'agents':>7} {'map':>8} {'init ms':>8} {'steps/s':>8} {'peak MiB':>9}")
+    for scenario in scenarios:
+        result = measure(scenario, steps, seed, repeats)
+        results.append(result)
+        agents = result["num_civilians"] + result["num_military"] + result["num_terrorists"]
+        print(f"{result['name']:<16} {agents:>7} {result['width']:>4}x{result['height']:<3} "
+              f"{result['init_seconds'] * 1000:>8.1f} {result['steps_per_second'] or 0:>8.1f} "
+              f"{result['peak_memory_bytes'] / 2 ** 20:>9.1f}")
+    environment = {"python": sys.version.split()[0], "platform": platform.platform(),
+                   "mesa": mesa.__version__, "numpy": np.__version__,
+                   "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(output, "w") as file:
+        json.dump({"environment": environment, "results": results}, file, indent=2)
+    return results
+
+
+def compare(baseline, candidate, threshold):
+    """Print how candidate's results differ from baseline's; return the names of regressed metrics.
+
+    Cases whose fingerprints differ followed a different trajectory, so their
+    timings aren't a like-for-like comparison.
+    """
+    with open(baseline) as file:
+        before = {result["name"]: result for result in json.load(file)["results"]}
+    with open(candidate) as file:
+        after = {result["name"]: result for result in json.load(file)["results"]}
+    # (metric, True when bigger is better)
+    metrics = [("steps_per_second", True), ("init_seconds", False), ("peak_memory_bytes", False)]
+    regressions = []
+    print(f"{'case':<16} {'metric':<18} {'baseline':>12} {'candidate':>12} {'change':>8}")
+    for name in [name for name in before if name in after]:
+        if before[name].get("fingerprint") != after[name].get("fingerprint"):
+            print(f"{name:<16} trajectory changed")
+        for metric, higher_is_better in metrics:
+            old, new = before[name][metric], after[name][metric]
+            if not old or new is None:
+                continue
+            change = new / old - 1
+            regressed = (-change if higher_is_better else change) > threshold
+            if regressed:
+                regressions.append(f"{name} {metric}")
+            print(f"{name:<16} {metric:<18} {old:>12.4g} {new:>12.4g} {change:>+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+    for name in before.keys() ^ after.keys():
+        print(f"{name:<16} only in {baseline if name in before else candidate}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark WarZoneModel and compare benchmark results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scale = commands.add_parser("scaling", help="show how step time grows with population")
+    scale.add_argument("--factors", type=int, nargs="+", default=[1, 2, 4, 8],
+                       help="multiples of the server slider limits to run")
+    scale.add_argument("--steps", type=int, default=5)
+    scale.add_argument("--seed", type=int, default=0)
+    suite = commands.add_parser("suite", help="run the benchmark suite and save the results as JSON")
+    suite.add_argument("output")
+    suite.add_argument("--cases", nargs="+", choices=[scenario["name"] for scenario in SUITE],
+                       help="only run these cases")
+    suite.add_argument("--steps", type=int, default=20)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--repeats", type=int, default=3)
+    check = commands.add_parser("compare", help="flag regressions between two suite result files")
+    check.add_argument("baseline")
+    check.add_argument("candidate")
+    check.add_argument("--threshold", type=float, default=0.1,
+                       help="relative slowdown or growth that counts as a regression")
+    start = commands.add_parser("startup", help="time module imports and starting worker processes")
+    start.add_argument("--workers", type=int, default=4)
+    start.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    if args.command == "scaling":
+        scaling(args.factors, args.steps, args.seed)
+    elif args.command == "startup":
+        startup(args.workers, args.repeats)
+    elif args.command == "suite":
+        run_suite([scenario for scenario in SUITE if not args.cases or scenario["name"] in args.cases],
+                  args.steps, args.seed, args.output, args.repeats)
+    else:
+        regressions = compare(args.baseline, args.candidate, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s)")
+            sys.exit(1)
@@ -0,0 +1,124 @@
+import numpy as np
+
+from columnar import ColumnarStore
+
+POPULATION_LABELS = ["Civilians", "Military", "Terrorists"]
+CAUSES = ["blast", "military"]
+POPULATION_COLUMNS = {"step": np.int64, "Civilians": np.int64, "Military": np.int64, "Terrorists": np.int64,
+                      "Danger Zones": np.int64}
+# victim and cause are indexes into POPULATION_LABELS and CAUSES
+CASUALTY_COLUMNS = {"step": np.int64, "victim": np.int8, "x": np.int32, "y": np.int32, "cause": np.int8}
+
+
+class RingBuffer:
+    """The most recent capacity rows of a table, in column arrays allocated up front."""
+
+    def __init__(self, columns, capacity):
+        self.capacity = capacity
+        self.arrays = {name: np.zeros(capacity, dtype=dtype) for name, dtype in columns.items()}
+        self.appended = 0
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def append(self, row):
+        slot = self.appended % self.capacity
+        for name, array in self.arrays.items():
+            array[slot] = row[name]
+        self.appended += 1
+
+    def column(self, name):
+        """The retained values of one column, oldest first."""
+        array = self.arrays[name]
+        if self.appended <= self.capacity:
+            return array[:self.appended]
+        slot = self.appended % self.capacity
+        return np.concatenate([array[slot:], array[:slot]])
+
+
+class ColumnarSink:
+    """Rows appended to one table of a ColumnarStore, written out flush_every rows at a time."""
+
+    def __init__(self, store, table, columns, flush_every):
+        self.store = store
+        self.table = table
+        self.columns = columns
+        self.flush_every = flush_every
+        self.pending = {name: [] for name in columns}
+
+    def append(self, row):
+        for name, values in self.pending.items():
+            values.append(row[name])
+        if len(self.pending["step"]) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.pending["step"]:
+            self.store.write_chunk({self.table: {name: np.array(values, dtype=self.columns[name])
+                                                 for name, values in self.pending.items()}})
+            for values in self.pending.values():
+                values.clear()
+
+
+class StreamCollector:
+    """Per-step population counts and a casualty ledger, in bounded memory.
+
+    Stands in for mesa's DataCollector as model.datacollector. Only the last
+    history steps and casualty_history casualties (history unless given)
+    are kept in memory; pass a directory to also append every row to a
+    ColumnarStore there, as "populations" and "casualties" tables. The
+    report is built from running totals updated as rows arrive, so it never
+    needs the full history.
+    """
+
+    def __init__(self, history=1000, directory=None, flush_every=1000, casualty_history=None):
+        self.populations = RingBuffer(POPULATION_COLUMNS, history)
+        self.casualty_ledger = RingBuffer(CASUALTY_COLUMNS, casualty_history or history)
+        self.sinks = {}
+        if directory:
+            store = ColumnarStore(directory)
+            self.sinks = {"populations": ColumnarSink(store, "populations", POPULATION_COLUMNS, flush_every),
+                          "casualties": ColumnarSink(store, "casualties", CASUALTY_COLUMNS, flush_every)}
+        self.summary = {
+            "casualties": dict.fromkeys(POPULATION_LABELS, 0),
+            "causes": dict.fromkeys(CAUSES, 0),
+            # [step, casualties] of the step with the most casualties, and of the latest step with any
+            "deadliest": [None, 0],
+            "latest": [None, 0],
+        }
+
+    @property
+    def model_vars(self):
+        """{label: retained counts}, the part of DataCollector that ChartModule and batch read."""
+        return {label: self.populations.column(label).tolist() for label in POPULATION_LABELS}
+
+    def collect(self, model):
+        row = model.populations()
+        row["step"] = model.schedule.steps
+        row["Danger Zones"] = model.danger.count
+        self.append("populations", self.populations, row)
+
+    def record_casualty(self, step, victim, pos, cause):
+        """Log that a member of population victim died at pos on step, by blast or military."""
+        summary = self.summary
+        summary["casualties"][victim] += 1
+        summary["causes"][cause] += 1
+        latest = summary["latest"]
+        if latest[0] != step:
+            latest[:] = [step, 0]
+        latest[1] += 1
+        if latest[1] > summary["deadliest"][1]:
+            summary["deadliest"] = list(latest)
+        row = {"step": step, "victim": POPULATION_LABELS.index(victim), "x": pos[0], "y": pos[1],
+               "cause": CAUSES.index(cause)}
+        self.append("casualties", self.casualty_ledger, row)
+
+    def append(self, table, buffer, row):
+        buffer.append(row)
+        if table in self.sinks:
+            self.sinks[table].append(row)
+
+    def close(self):
+        """Write out any rows still waiting for the columnar store."""
+        for sink in self.sinks.values():
+            sink.flush()
@@ -0,0 +1,53 @@
+import glob
+import os
+
+import numpy as np
+
+
+class ColumnarStore:
+    """An append-only directory of column-oriented chunks.
+
+    Each chunk is an .npz file holding one array per column for one or more
+    tables. Chunks are written to a temporary file and renamed into place, so
+    a crash can lose the chunk being written but never leaves a partial one.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.next_chunk = len(self.chunk_paths())
+
+    def chunk_paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, "chunk-*.npz")))
+
+    def write_chunk(self, tables):
+        """Write {table: {column: values}} as a new chunk."""
+        arrays = {f"{table}/{column}": np.asarray(values)
+                  for table, columns in tables.items() for column, values in columns.items()}
+        path = os.path.join(self.directory, f"chunk-{self.next_chunk:06d}.npz")
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as stream:
+            np.savez_compressed(stream, **arrays)
+        os.replace(temporary, path)
+        self.next_chunk += 1
+
+    def read(self, table, columns=None):
+        """Concatenate a table's columns across every chunk, as {column: array}."""
+        prefix = f"{table}/"
+        parts = {}
+        for path in self.chunk_paths():
+            with np.load(path) as chunk:
+                for key in chunk.files:
+                    column = key[len(prefix):]
+                    if key.startswith(prefix) and (columns is None or column in columns):
+                        parts.setdefault(column, []).append(chunk[key])
+        return {column: np.concatenate(values) for column, values in parts.items()}
+
+
+def rows_to_columns(rows):
+    """Turn a list of dicts with the same keys into {column: list}."""
+    columns = {}
+    for row in rows:
+        for key, value in row.items():
+            columns.setdefault(key, []).append(value)
+    return columns
@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class DangerLayer:
+    """Danger zones as one boolean per grid cell.
+
+    Replaces OrangeCell agents on the grid: passability checks are a single
+    lookup and a blast footprint is stamped in one go, however many blasts
+    hit the same cells.
+    """
+
+    def __init__(self, width, height):
+        self.cells = np.zeros((width, height), dtype=bool)
+        self.count = 0
+
+    def is_danger(self, pos):
+        return self.cells[pos[0], pos[1]]
+
+    def stamp(self, positions):
+        """Mark positions as danger zones and return the ones that weren't already."""
+        x, y = np.asarray(positions).reshape(-1, 2).T
+        x, y = np.unique(np.stack([x, y]), axis=1)
+        fresh = ~self.cells[x, y]
+        self.cells[x[fresh], y[fresh]] = True
+        self.count += int(np.count_nonzero(fresh))
+        return list(zip(x[fresh].tolist(), y[fresh].tolist()))
+
+    def positions(self):
+        return [tuple(pos) for pos in np.argwhere(self.cells).tolist()]
+
+
+class SparseDangerLayer:
+    """Danger zones as a set of positions, for maps too large for a boolean per cell."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.zones = set()
+        self.count = 0
+
+    @property
+    def cells(self):
+        """The zones as a dense boolean array, as DangerLayer keeps them; built on every call."""
+        cells = np.zeros((self.width, self.height), dtype=bool)
+        if self.zones:
+            x, y = np.array(sorted(self.zones)).T
+            cells[x, y] = True
+        return cells
+
+    def is_danger(self, pos):
+        return pos in self.zones
+
+    def stamp(self, positions):
+        """Mark positions as danger zones and return the ones that weren't already."""
+        fresh = {tuple(pos) for pos in np.asarray(positions).reshape(-1, 2).tolist()} - self.zones
+        self.zones |= fresh
+        self.count += len(fresh)
+        return sorted(fresh)
+
+    def positions(self):
+        return sorted(self.zones)
@@ -0,0 +1,147 @@
+/**
+Draws the frames of visualization.DeltaCanvasGrid.
+
+The canvas keeps the last picture and each frame only redraws what it lists:
+"cells" frames give [x, y, code, ...] triples, where bit i of code means the
+cell holds a layer drawn with styles[i]; "heatmap" frames give an intensity
+per block of cells for each layer, as base64 bytes in a full frame or as
+[changed blocks, new intensities] otherwise. Changes are kept as they
+arrive and drawn at most max_fps times a second; whatever is still pending
+is drawn once that interval is up, so a paused model's picture is current.
+*/
+var DeltaCanvasModule = function(canvas_width, canvas_height, grid_width, grid_height, styles, max_fps) {
+	var canvas_tag = `<canvas width="${canvas_width}" height="${canvas_height}" class="world-grid"/>`;
+	var parent_div_tag = '<div style="height:' + canvas_height + 'px;" class="world-grid-parent"></div>';
+	var canvas = $(canvas_tag)[0];
+	var parent = $(parent_div_tag)[0];
+	$("#elements").append(parent);
+	parent.append(canvas);
+	var context = canvas.getContext("2d");
+
+	var cellWidth = canvas_width / grid_width;
+	var cellHeight = canvas_height / grid_height;
+	var maxR = Math.min(cellWidth, cellHeight) / 2;
+	// Layer indexes in drawing order, lowest portrayal Layer first
+	var order = styles.map(function(style, index) { return index; })
+		.sort(function(a, b) { return styles[a].Layer - styles[b].Layer; });
+	var heat = null;
+	// Changes not drawn yet: "x,y" -> [x, y, code], and heatmap blocks
+	var cells = {};
+	var bins = {};
+	var clearAll = false;
+	var drawnAt = 0;
+	var timer = null;
+
+	var colorOf = function(style) {
+		return Array.isArray(style.Color) ? style.Color[0] : style.Color;
+	};
+
+	var clear = function(x, y, w, h) {
+		// Canvas y runs top to bottom, grid y bottom to top
+		context.clearRect(x * cellWidth, (grid_height - y - h) * cellHeight, w * cellWidth, h * cellHeight);
+	};
+
+	var drawCell = function(x, y, code) {
+		clear(x, y, 1, 1);
+		var cx = (x + 0.5) * cellWidth;
+		var cy = (grid_height - y - 0.5) * cellHeight;
+		order.forEach(function(layer) {
+			if (!(code & (1 << layer)))
+				return;
+			var style = styles[layer];
+			context.fillStyle = context.strokeStyle = colorOf(style);
+			context.beginPath();
+			if (style.Shape == "rect")
+				context.rect(cx - style.w * cellWidth / 2, cy - style.h * cellHeight / 2,
+					style.w * cellWidth, style.h * cellHeight);
+			else
+				context.arc(cx, cy, style.r * maxR, 0, Math.PI * 2, false);
+			style.Filled ? context.fill() : context.stroke();
+		});
+	};
+
+	var drawBin = function(index) {
+		var bx = Math.floor(index / heat.bins[1]);
+		var by = index % heat.bins[1];
+		var size = heat.bin_size;
+		clear(bx * size, by * size, size, size);
+		order.forEach(function(layer) {
+			var level = heat.layers[layer][index];
+			if (!level)
+				return;
+			context.globalAlpha = level / (heat.levels - 1);
+			context.fillStyle = colorOf(styles[layer]);
+			context.fillRect(bx * size * cellWidth, (grid_height - (by + 1) * size) * cellHeight,
+				size * cellWidth, size * cellHeight);
+		});
+		context.globalAlpha = 1;
+	};
+
+	var decode = function(text) {
+		var bytes = atob(text);
+		var levels = new Uint8Array(bytes.length);
+		for (var i = 0; i < bytes.length; i++)
+			levels[i] = bytes.charCodeAt(i);
+		return levels;
+	};
+
+	var draw = function() {
+		timer = null;
+		drawnAt = Date.now();
+		if (clearAll)
+			context.clearRect(0, 0, canvas_width, canvas_height);
+		Object.keys(cells).forEach(function(key) { drawCell.apply(null, cells[key]); });
+		Object.keys(bins).forEach(function(index) { drawBin(Number(index)); });
+		cells = {};
+		bins = {};
+		clearAll = false;
+	};
+
+	var apply = function(data) {
+		if (data.full) {
+			cells = {};
+			bins = {};
+			clearAll = true;
+		}
+		if (data.mode == "cells") {
+			for (var i = 0; i < data.cells.length; i += 3)
+				cells[data.cells[i] + "," + data.cells[i + 1]] = data.cells.slice(i, i + 3);
+			return;
+		}
+		if (data.full) {
+			heat = {bins: data.bins, bin_size: data.bin_size, levels: data.levels, layers: data.layers.map(decode)};
+			for (var index = 0; index < heat.layers[0].length; index++)
+				bins[index] = true;
+			return;
+		}
+		data.layers.forEach(function(delta, layer) {
+			delta[0].forEach(function(index, i) {
+				heat.layers[layer][index] = delta[1][i];
+				bins[index] = true;
+			});
+		});
+	};
+
+	this.render = function(data) {
+		if (!data)
+			return;
+		apply(data);
+		var wait = drawnAt + 1000 / max_fps - Date.now();
+		if (wait <= 0) {
+			clearTimeout(timer);
+			draw();
+		} else if (timer === null) {
+			timer = setTimeout(draw, wait);
+		}
+	};
+
+	this.reset = function() {
+		clearTimeout(timer);
+		timer = null;
+		context.clearRect(0, 0, canvas_width, canvas_height);
+		heat = null;
+		cells = {};
+		bins = {};
+		clearAll = false;
+	};
+};
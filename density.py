@@ -0,0 +1,91 @@
+import numpy as np
+
+from agents import CivilianAgent, MilitaryAgent
+from grid import GridListener
+
+# The 24 cells around a terrorist that decide whether it detonates
+BLAST_TRIGGER_OFFSETS = np.array([(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if dx or dy])
+
+
+def cell_counts(x, y, width, height):
+    """Number of agents in every cell, as a width x height array."""
+    return np.bincount(x * height + y, minlength=width * height).reshape(width, height)
+
+
+def wrapped_box_sum(counts, radius):
+    """Sum of counts over the (2 * radius + 1)^2 window around every cell of a torus."""
+    width, height = counts.shape
+    size = 2 * radius + 1
+    table = np.zeros((width + 2 * radius + 1, height + 2 * radius + 1), dtype=np.int64)
+    table[1:, 1:] = np.pad(counts, radius, mode="wrap").cumsum(0).cumsum(1)
+    return (table[size:size + width, size:size + height] - table[:width, size:size + height]
+            - table[size:size + width, :height] + table[:width, :height])
+
+
+class DensityMap(GridListener):
+    """Civilians plus military per cell, for the blast trigger.
+
+    A civilian or soldier moving costs two count updates, and a move that
+    stays in its cell costs nothing; a terrorist's check sums the 24 cells
+    around it, so the counts are always current mid-step.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.counts = [0] * (width * height)
+        self.offsets = [tuple(offset) for offset in BLAST_TRIGGER_OFFSETS.tolist()]
+        # The same offsets as steps in flat cell index, for cells whose ring doesn't wrap
+        self.flat_offsets = [dx * height + dy for dx, dy in self.offsets]
+
+    def ring(self, pos):
+        """Flat indexes of the 24 cells around pos."""
+        x, y = pos
+        width, height = self.width, self.height
+        if 2 <= x < width - 2 and 2 <= y < height - 2:
+            index = x * height + y
+            return [index + offset for offset in self.flat_offsets]
+        return [((x + dx) % width) * height + (y + dy) % height for dx, dy in self.offsets]
+
+    def crowd_around(self, pos):
+        counts = self.counts
+        return sum(counts[index] for index in self.ring(pos))
+
+    def on_place(self, agent, pos):
+        if isinstance(agent, (CivilianAgent, MilitaryAgent)):
+            self.counts[pos[0] * self.height + pos[1]] += 1
+
+    def on_remove(self, agent, pos):
+        if isinstance(agent, (CivilianAgent, MilitaryAgent)):
+            self.counts[pos[0] * self.height + pos[1]] -= 1
+
+    def on_move(self, agent, old_pos, new_pos):
+        if old_pos != new_pos:
+            self.on_remove(agent, old_pos)
+            self.on_place(agent, new_pos)
+
+
+class SparseDensityMap(GridListener):
+    """DensityMap for sparse grids: counts for the occupied cells only, summed over the 24 cells on each check."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.counts = {}  # pos -> civilians plus military in that cell
+        self.offsets = [tuple(offset) for offset in BLAST_TRIGGER_OFFSETS.tolist()]
+
+    def crowd_around(self, pos):
+        x, y = pos
+        counts = self.counts
+        return sum(counts.get(((x + dx) % self.width, (y + dy) % self.height), 0) for dx, dy in self.offsets)
+
+    def on_place(self, agent, pos):
+        if isinstance(agent, (CivilianAgent, MilitaryAgent)):
+            self.counts[pos] = self.counts.get(pos, 0) + 1
+
+    def on_remove(self, agent, pos):
+        if isinstance(agent, (CivilianAgent, MilitaryAgent)):
+            if self.counts[pos] == 1:
+                del self.counts[pos]
+            else:
+                self.counts[pos] -= 1
@@ -0,0 +1,88 @@
+import argparse
+import importlib
+import statistics
+
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent
+from seeding import replica_seeds
+
+# Engine name -> (module, class), imported on first use so that workers only load the engine they run
+ENGINES = {"object": ("model", "WarZoneModel"), "array": ("array_model", "ArrayWarZoneModel"),
+           "parallel": ("parallel_engine", "ParallelWarZoneModel")}
+# Options that put each engine in the mode the others implement: the NumPy engines have no squads,
+# their soldiers each chase the nearest terrorist, so the object engine is compared with squads off
+COMPARABLE_OPTIONS = {"object": {"squads": False}}
+POPULATIONS = {"Civilians": CivilianAgent, "Military": MilitaryAgent, "Terrorists": TerroristAgent}
+
+
+def create_model(num_civilians, num_military, num_terrorists, engine="object", seed=None, **kwargs):
+    """Build a WarZoneModel with the chosen engine: "object" (mesa agents), "array" (NumPy) or
+    "parallel" (NumPy in worker processes, one strip of the map each)."""
+    return engine_class(engine)(num_civilians, num_military, num_terrorists, seed=seed, **kwargs)
+
+
+def engine_class(engine):
+    module, name = ENGINES[engine]
+    return getattr(importlib.import_module(module), name)
+
+
+def run_until_done(model, max_steps):
+    """Step a headless model until a population dies out or max_steps is reached."""
+    while model.running and model.schedule.steps < max_steps:
+        model.step()
+    if hasattr(model, "close"):
+        model.close()
+    outcome = {name: model.count_type(model, agent_type) for name, agent_type in POPULATIONS.items()}
+    outcome["Steps"] = model.schedule.steps
+    return outcome
+
+
+def welch_t(first, second):
+    mean_difference = statistics.mean(first) - statistics.mean(second)
+    spread = (statistics.variance(first) / len(first) + statistics.variance(second) / len(second)) ** 0.5
+    if spread == 0:
+        return 0.0 if mean_difference == 0 else float("inf")
+    return mean_difference / spread
+
+
+def compare_engines(num_civilians=100, num_military=50, num_terrorists=20, runs=30, max_steps=200, threshold=3.0,
+                    seed=0, engines=("object", "array")):
+    """Check that two engines give statistically equivalent outcomes.
+
+    Runs each engine over the same replica seeds, derived from seed, and compares the final populations and
+    run lengths with Welch's t statistic. Returns True when every |t| stays
+    under threshold. Engines run with COMPARABLE_OPTIONS, and only that
+    configuration is claimed to be equivalent: the object engine's default
+    squad pursuit has no counterpart in the NumPy engines, and its outcomes
+    differ from theirs.
+    """
+    outcomes = {engine: [run_until_done(create_model(num_civilians, num_military, num_terrorists,
+                                                     engine=engine, seed=seed, show_report=False,
+                                                     **COMPARABLE_OPTIONS.get(engine, {})), max_steps)
+                         for seed in replica_seeds(seed, runs)]
+                for engine in engines}
+    equivalent = True
+    print(f"{'metric':<12} {engines[0]:>16} {engines[1]:>16} {'t':>7}")
+    for metric in list(POPULATIONS) + ["Steps"]:
+        samples = {engine: [outcome[metric] for outcome in results] for engine, results in outcomes.items()}
+        t = welch_t(*samples.values())
+        equivalent = equivalent and abs(t) < threshold
+        print(f"{metric:<12} "
+              + " ".join(f"{statistics.mean(s):>8.1f} ± {statistics.stdev(s):>5.1f}" for s in samples.values())
+              + f" {t:>7.2f}")
+    return equivalent
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistical equivalence check between the model engines.")
+    parser.add_argument("--civilians", type=int, default=100)
+    parser.add_argument("--military", type=int, default=50)
+    parser.add_argument("--terrorists", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--max-steps", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="root seed the replica seeds are derived from")
+    parser.add_argument("--engines", nargs=2, choices=list(ENGINES), default=["object", "array"])
+    args = parser.parse_args()
+    passed = compare_engines(args.civilians, args.military, args.terrorists, args.runs, args.max_steps,
+                             seed=args.seed, engines=args.engines)
+    print("equivalent" if passed else "NOT equivalent")
+    raise SystemExit(0 if passed else 1)
@@ -0,0 +1,139 @@
+from mesa.space import MultiGrid
+
+
+class GridListener:
+    """Receives placement, movement and removal notifications from a WarZoneGrid."""
+
+    def on_place(self, agent, pos):
+        pass
+
+    def on_remove(self, agent, pos):
+        pass
+
+    def on_move(self, agent, old_pos, new_pos):
+        self.on_remove(agent, old_pos)
+        self.on_place(agent, new_pos)
+
+
+class SparseMultiGrid:
+    """A MultiGrid that only stores the occupied cells, for maps too large to allocate cell by cell.
+
+    Cells live in a dict from position to the agents there, so memory grows
+    with the number of occupied cells rather than the map's area. The calls
+    the agents make of a MultiGrid give the same results in the same order,
+    except that coord_iter only visits occupied cells.
+    """
+
+    def __init__(self, width, height, torus):
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.cells = {}  # pos -> agents in that cell, in arrival order
+        # Sorted neighbourhood offsets per (moore, include_center, radius)
+        self._offsets = {}
+
+    def out_of_bounds(self, pos):
+        x, y = pos
+        return x < 0 or x >= self.width or y < 0 or y >= self.height
+
+    def torus_adj(self, pos):
+        if not self.out_of_bounds(pos):
+            return pos
+        if not self.torus:
+            raise Exception("Point out of bounds, and space non-toroidal.")
+        return pos[0] % self.width, pos[1] % self.height
+
+    def get_neighborhood(self, pos, moore, include_center=False, radius=1):
+        key = (moore, include_center, radius)
+        offsets = self._offsets.get(key)
+        if offsets is None:
+            offsets = self._offsets[key] = sorted(
+                (dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+                if (dx or dy or include_center) and (moore or abs(dx) + abs(dy) <= radius))
+        x, y = pos
+        if radius <= x < self.width - radius and radius <= y < self.height - radius:
+            return [(x + dx, y + dy) for dx, dy in offsets]
+        # Near the edge, cells wrap or drop out and may coincide, as in MultiGrid
+        coordinates = set()
+        for dx, dy in offsets:
+            coord = (x + dx, y + dy)
+            if self.out_of_bounds(coord):
+                if not self.torus:
+                    continue
+                coord = self.torus_adj(coord)
+            coordinates.add(coord)
+        return sorted(coordinates)
+
+    def get_neighbors(self, pos, moore, include_center=False, radius=1):
+        return self.get_cell_list_contents(self.get_neighborhood(pos, moore, include_center, radius))
+
+    def get_cell_list_contents(self, cell_list):
+        if isinstance(cell_list, tuple) and len(cell_list) == 2:
+            cell_list = [cell_list]
+        cells = self.cells
+        return [agent for pos in cell_list for agent in cells.get(self.torus_adj(pos), ())]
+
+    def is_cell_empty(self, pos):
+        return pos not in self.cells
+
+    def coord_iter(self):
+        for (x, y), cell in list(self.cells.items()):
+            yield cell, x, y
+
+    def place_agent(self, agent, pos):
+        self._place_agent(pos, agent)
+        agent.pos = pos
+
+    def move_agent(self, agent, pos):
+        pos = self.torus_adj(pos)
+        self._remove_agent(agent.pos, agent)
+        self._place_agent(pos, agent)
+        agent.pos = pos
+
+    def remove_agent(self, agent):
+        self._remove_agent(agent.pos, agent)
+        agent.pos = None
+
+    def _place_agent(self, pos, agent):
+        cell = self.cells.setdefault(pos, [])
+        if agent not in cell:
+            cell.append(agent)
+
+    def _remove_agent(self, pos, agent):
+        cell = self.cells[pos]
+        cell.remove(agent)
+        if not cell:
+            del self.cells[pos]
+
+
+class ListenedGrid:
+    """Grid mixin that keeps the model's indexes in step with agent positions."""
+
+    def __init__(self, width, height, torus):
+        super().__init__(width, height, torus)
+        self.listeners = []
+
+    def place_agent(self, agent, pos):
+        super().place_agent(agent, pos)
+        for listener in self.listeners:
+            listener.on_place(agent, agent.pos)
+
+    def move_agent(self, agent, pos):
+        old_pos = agent.pos
+        super().move_agent(agent, pos)
+        for listener in self.listeners:
+            listener.on_move(agent, old_pos, agent.pos)
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        super().remove_agent(agent)
+        for listener in self.listeners:
+            listener.on_remove(agent, pos)
+
+
+class WarZoneGrid(ListenedGrid, MultiGrid):
+    """A MultiGrid that keeps the model's indexes in step with agent positions."""
+
+
+class SparseWarZoneGrid(ListenedGrid, SparseMultiGrid):
+    """A SparseMultiGrid that keeps the model's indexes in step with agent positions."""
@@ -1,74 +1,134 @@
+import random
+
+import numpy as np
 from mesa import Model
 from mesa.time import RandomActivation
-from mesa.space import MultiGrid
 from agents import CivilianAgent, MilitaryAgent, TerroristAgent, OrangeCell
-from mesa.datacollection import DataCollector
-from report_element import display_report
-import tkinter as tk
-from tkinter import messagebox
+from grid import WarZoneGrid, SparseWarZoneGrid
+from occupancy import OccupancyIndex
+from spatial_index import TerroristIndex
+from danger import DangerLayer, SparseDangerLayer
+from navigation import Navigation, DirectNavigation
+from density import DensityMap, SparseDensityMap
+from profiling import Profiler
+from collection import StreamCollector
+from seeding import fresh_seed
+from targeting import ASSIGNMENTS
+from squads import Squads
+from reporting import DEFAULT_SINKS, make_sinks
+
+CROWDED_AREAS = [(2,2), (7, 15), (15, 7), (10, 15), (10, 29), (27, 25), (28,3), (2,28)]
+HIGH_VALUE_AREAS = [(30 // 2, 30 // 2)]  # Example high-value area
+AGENT_LABELS = {CivilianAgent: "Civilians", MilitaryAgent: "Military", TerroristAgent: "Terrorists"}
+
+
+def scale_areas(areas, width, height):
+    # The default areas are laid out for a 30x30 map
+    return [(x * width // 30, y * height // 30) for x, y in areas]
 
 class WarZoneModel(Model):
     """The main WarZoneMAS model."""
-    def __init__(self, num_civilians, num_military, num_terrorists):
+    def __init__(self, num_civilians, num_military, num_terrorists, seed=None, show_report=True,
+                 width=30, height=30, profile=False, navigation=None,
+                 collector=None, targeting=None, squads=True, crowded_areas=None, high_value_areas=None,
+                 sparse=False, report_sinks=None, danger_zones=None):
         self.num_civilians = num_civilians
         self.num_military = num_military
         self.num_terrorists = num_terrorists
-        self.grid = MultiGrid(30, 30, True)
+        # Every draw comes from this generator. mesa keeps it on the class, where every
+        # new model replaces it; unseeded runs get a fresh seed, kept so they can be repeated
+        self.seed = seed if seed is not None else fresh_seed()
+        self.random = random.Random(self.seed)
+        self.sparse = sparse
+        # Sparse maps store only the occupied cells, danger zones and crowd counts
+        if sparse:
+            self.grid = SparseWarZoneGrid(width, height, True)
+            self.danger = SparseDangerLayer(width, height)
+            self.density = SparseDensityMap(width, height)
+        else:
+            self.grid = WarZoneGrid(width, height, True)
+            self.danger = DangerLayer(width, height)
+            self.density = DensityMap(width, height)
+        # On sparse maps civilian cells are filed in blocks too, to be searched nearest first,
+        # and blocks grow with the map so that searches cross few empty ones
+        block_size = max(4, max(width, height) // 64) if sparse else 4
+        self.occupancy = OccupancyIndex(bucket_size=block_size if sparse else None)
+        # Military pursuit measures plain Manhattan distance, so the index doesn't wrap either
+        self.terrorists = TerroristIndex(width, height, torus=False, bucket_size=block_size)
+        self.grid.listeners.extend([self.occupancy, self.terrorists, self.density])
         self.schedule = RandomActivation(self)
         self.running = True
-
-        self.crowded_areas = [(2,2), (7, 15), (15, 7), (10, 15), (10, 29), (27, 25), (28,3), (2,28)]
-        self.high_value_areas = [(30 // 2, 30 // 2)]  # Example high-value area
+        self.show_report = show_report
+        self.report_sinks = make_sinks(DEFAULT_SINKS if report_sinks is None else report_sinks)
+        # Batch assignments work on whole-map arrays, so sparse maps pick targets one terrorist at a time
+        if targeting is None:
+            targeting = "sequential" if sparse else "greedy"
+        if targeting != "sequential" and targeting not in ASSIGNMENTS:
+            raise ValueError(f"unknown targeting {targeting!r}")
+        self.targeting = targeting
+        # Without squads every soldier chases its nearest terrorist, as in the array and parallel engines
+        self.squads = Squads(self.grid.width, self.grid.height) if squads else None
+        self.profiler = Profiler() if profile else None
+
+        self.crowded_areas = crowded_areas or scale_areas(CROWDED_AREAS, width, height)
+        self.high_value_areas = high_value_areas or scale_areas(HIGH_VALUE_AREAS, width, height)
+        # A navigation for the same map and danger zones is copied rather than computed again;
+        # sparse maps step straight around danger zones instead of keeping flow fields
+        if navigation:
+            self.navigation = navigation.copy()
+        elif sparse:
+            self.navigation = DirectNavigation(width, height)
+        else:
+            self.navigation = Navigation(self.grid.width, self.grid.height, self.danger)
+            self.navigation.precompute(self.crowded_areas + self.high_value_areas)
 
         # Track initial populations
         self.initial_civilians = num_civilians
         self.initial_military = num_military
         self.initial_terrorists = num_terrorists
 
-        # Track casualties
-        self.civilian_casualties = 0
-        self.military_casualties = 0
-        self.terrorist_casualties = 0
         self.danger_zones_created = 0
+        # Danger zones from the start are stamped before anyone is placed, so no agent starts on one
+        if danger_zones is not None and len(danger_zones):
+            self.create_danger_zones(danger_zones)
+            if self.danger.count == width * height and num_civilians + num_military + num_terrorists:
+                raise ValueError("every cell is a danger zone, so there is nowhere to place agents")
+
+        # Live population per type, kept up to date by add_agent and remove_agent,
+        # and the live agents of each type by unique_id, in schedule order
+        self.population = {CivilianAgent: 0, MilitaryAgent: 0, TerroristAgent: 0}
+        self.agents_by_type = {CivilianAgent: {}, MilitaryAgent: {}, TerroristAgent: {}}
 
         # Add civilians
         for i in range(num_civilians):
             civilian = CivilianAgent(i,self)
-            self.schedule.add(civilian)
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(civilian, (x, y))
+            self.add_agent(civilian, self.random_safe_cell())
 
         # Add military agents
         for i in range(num_civilians, num_civilians + num_military):
             military = MilitaryAgent(i, self)
-            self.schedule.add(military)
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(military, (x, y))
+            self.add_agent(military, self.random_safe_cell())
 
         # Add terrorist agents
         for i in range(num_civilians + num_military, num_civilians + num_military + num_terrorists):
             terrorist = TerroristAgent(i, self)
-            self.schedule.add(terrorist)
-            x = self.random.randrange(self.grid.width)
-            y = self.random.randrange(self.grid.height)
-            self.grid.place_agent(terrorist, (x, y))
-
-                # Add data collector
-        self.datacollector = DataCollector(
-            {
-                "Civilians": lambda m: self.count_type(m, CivilianAgent),
-                "Military": lambda m: self.count_type(m, MilitaryAgent),
-                "Terrorists": lambda m: self.count_type(m, TerroristAgent),
-            }
-        )
+            self.add_agent(terrorist, self.random_safe_cell())
+
+        # Population counts and the casualty ledger
+        self.datacollector = collector or StreamCollector()
 
         # Initialize report attribute
         self.report = None
 
+        if self.profiler:
+            self.profiler.instrument_model(self)
+
     def step(self):
         self.datacollector.collect(self)
+        if self.targeting != "sequential":
+            self.assign_targets()
+        if self.squads:
+            self.squads.update(self)
         self.schedule.step()
         self.check_for_report()
 
@@ -84,11 +144,7 @@ class WarZoneModel(Model):
         final_civilians = self.count_type(self, CivilianAgent)
         final_military = self.count_type(self, MilitaryAgent)
         final_terrorists = self.count_type(self, TerroristAgent)
-
-        self.civilian_casualties = self.initial_civilians-final_civilians
-        self.military_casualties = self.initial_military-final_military
-        self.terrorist_casualties = self.initial_terrorists-final_terrorists
-        self.danger_zones_created = self.count_type(self, OrangeCell)
+        summary = self.datacollector.summary
 
         self.report = {
             "Initial vs. Final Population": {
@@ -118,43 +174,78 @@ class WarZoneModel(Model):
                 "Civilians to Military": final_civilians / final_military if final_military > 0 else "N/A",
                 "Civilians to Terrorists": final_civilians / final_terrorists if final_terrorists > 0 else "N/A",
                 "Military to Terrorists": final_military / final_terrorists if final_terrorists > 0 else "N/A",
+            },
+            "Casualty Causes": {
+                "Blast": summary["causes"]["blast"],
+                "Military Encirclement": summary["causes"]["military"],
+            },
+            "Deadliest Step": {
+                "Step": summary["deadliest"][0] if summary["deadliest"][0] is not None else "N/A",
+                "Casualties": summary["deadliest"][1],
             }
         }
-        print("Simulation Report:")
-        for key, value in self.report.items():
-            print(f"{key}: {value}")
-        print("All Done!")
-
-        root = tk.Tk()
-        # root.withdraw()  # Hide the root window
-        report_text = ""
-        for key, value in self.report.items():
-            report_text += f"{key}:\n"
-            for sub_key, sub_value in value.items():
-                report_text += f"  {sub_key}: {sub_value}\n"
-            report_text += "\n"
-        messagebox.showinfo("Simulation Report", report_text)
-        root.destroy()
+        self.datacollector.close()
+        if self.show_report:
+            for sink in self.report_sinks:
+                sink.write(self.report)
         self.running = False
 
     @staticmethod
     def count_type(model, agent_type):
-        count = 0
-        for agent in model.schedule.agents:
-            if isinstance(agent, agent_type):
-                count += 1
-        return count
-
-    def remove_agent(self, agent):
-        if isinstance(agent, CivilianAgent):
-            self.civilian_casualties += 1
-        elif isinstance(agent, MilitaryAgent):
-            self.military_casualties += 1
-        elif isinstance(agent, TerroristAgent):
-            self.terrorist_casualties += 1
+        if agent_type is OrangeCell:
+            return model.danger.count
+        return model.population.get(agent_type, 0)
+
+    # Casualty totals, as counted by the collector
+    civilian_casualties = property(lambda self: self.datacollector.summary["casualties"]["Civilians"])
+    military_casualties = property(lambda self: self.datacollector.summary["casualties"]["Military"])
+    terrorist_casualties = property(lambda self: self.datacollector.summary["casualties"]["Terrorists"])
+
+    def populations(self):
+        return {label: self.population[agent_type] for agent_type, label in AGENT_LABELS.items()}
+
+    def random_safe_cell(self):
+        """A random cell that isn't a danger zone, drawn again until one is found."""
+        while True:
+            pos = (self.random.randrange(self.grid.width), self.random.randrange(self.grid.height))
+            if not self.danger.is_danger(pos):
+                return pos
+
+    def add_agent(self, agent, pos):
+        self.population[type(agent)] += 1
+        self.agents_by_type[type(agent)][agent.unique_id] = agent
+        if self.profiler:
+            self.profiler.instrument_agent(agent)
+        self.schedule.add(agent)
+        self.grid.place_agent(agent, pos)
+
+    def remove_agent(self, agent, cause):
+        """Take a casualty off the map; cause is "blast" or "military"."""
+        self.datacollector.record_casualty(self.schedule.steps, AGENT_LABELS[type(agent)], agent.pos, cause)
+        self.population[type(agent)] -= 1
+        del self.agents_by_type[type(agent)][agent.unique_id]
         self.grid.remove_agent(agent)
         self.schedule.remove(agent)
 
-    def create_danger_zone(self, pos):
-        self.danger_zones_created += 1
-        self.grid.place_agent(OrangeCell(pos), pos)
\ No newline at end of file
+    def assign_targets(self):
+        """Give every terrorist a target for this step, with no two sharing a cell.
+
+        Targets are cells with civilians and fewer than 4 military agents. Ties
+        go to the terrorist first in the schedule.
+        """
+        # The registry holds them in schedule order
+        terrorists = list(self.agents_by_type[TerroristAgent].values())
+        if not terrorists:
+            return
+        candidates = np.zeros((self.grid.width, self.grid.height), dtype=bool)
+        for pos in self.occupancy.civilians:
+            if self.occupancy.military_count(pos) < 4:
+                candidates[pos] = True
+        x, y = np.array([terrorist.pos for terrorist in terrorists]).T
+        target_x, target_y = ASSIGNMENTS[self.targeting](self.grid.width, self.grid.height, x, y, candidates)
+        for terrorist, target in zip(terrorists, zip(target_x.tolist(), target_y.tolist())):
+            terrorist.set_target(target if target[0] >= 0 else None)
+
+    def create_danger_zones(self, positions):
+        self.navigation.block(self.danger.stamp(positions))
+        self.danger_zones_created = self.danger.count
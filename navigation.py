@@ -0,0 +1,232 @@
+import heapq
+from collections import deque
+
+import numpy as np
+
+UNREACHABLE = -1
+MOORE_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+class FlowField:
+    """Shortest Moore-step distances to one target cell on the torus, avoiding danger zones.
+
+    Cells are stored flat, at index x * height + y. next_cell holds, for every
+    cell, the index of the neighbour to step to, or UNREACHABLE when the cell
+    is the target, a danger zone, or cut off from the target.
+    """
+
+    def __init__(self, navigation, target):
+        self.navigation = navigation
+        self.target = target
+        self.target_index = navigation.index(target)
+        self.rebuild()
+
+    def copy(self, navigation):
+        field = FlowField.__new__(FlowField)
+        field.navigation = navigation
+        field.target = self.target
+        field.target_index = self.target_index
+        field.distance = list(self.distance)
+        field.next_cell = list(self.next_cell)
+        return field
+
+    def rebuild(self):
+        navigation = self.navigation
+        size = navigation.width * navigation.height
+        self.distance = [UNREACHABLE] * size
+        self.next_cell = [UNREACHABLE] * size
+        if navigation.blocked[self.target_index]:
+            return
+        self.distance[self.target_index] = 0
+        queue = deque([self.target_index])
+        while queue:
+            index = queue.popleft()
+            for neighbour in navigation.neighbours(index):
+                if self.distance[neighbour] == UNREACHABLE and not navigation.blocked[neighbour]:
+                    self.distance[neighbour] = self.distance[index] + 1
+                    queue.append(neighbour)
+        for index in range(size):
+            self.next_cell[index] = self.best_step(index)
+
+    def block(self, indexes):
+        """Update the field for newly blocked cells, touching only the cells routed through them."""
+        if self.navigation.blocked[self.target_index]:
+            if self.distance[self.target_index] == 0:
+                self.rebuild()
+            return
+        navigation = self.navigation
+        # Every cell whose path to the target runs through a newly blocked cell
+        affected = set()
+        stack = [index for index in indexes if self.distance[index] != UNREACHABLE]
+        while stack:
+            index = stack.pop()
+            if index in affected:
+                continue
+            affected.add(index)
+            stack.extend(neighbour for neighbour in navigation.neighbours(index)
+                         if self.next_cell[neighbour] == index and neighbour not in affected)
+        for index in affected:
+            self.distance[index] = UNREACHABLE
+        # Re-grow the region from its untouched edge
+        heap = []
+        for index in affected:
+            if navigation.blocked[index]:
+                continue
+            reachable = [self.distance[neighbour] for neighbour in navigation.neighbours(index)
+                         if self.distance[neighbour] != UNREACHABLE]
+            if reachable:
+                self.distance[index] = min(reachable) + 1
+                heap.append((self.distance[index], index))
+        heapq.heapify(heap)
+        while heap:
+            distance, index = heapq.heappop(heap)
+            if distance > self.distance[index]:
+                continue
+            for neighbour in navigation.neighbours(index):
+                if neighbour in affected and not navigation.blocked[neighbour] and (
+                        self.distance[neighbour] == UNREACHABLE or distance + 1 < self.distance[neighbour]):
+                    self.distance[neighbour] = distance + 1
+                    heapq.heappush(heap, (distance + 1, neighbour))
+        for index in affected:
+            self.next_cell[index] = self.best_step(index)
+
+    def best_step(self, index):
+        distance = self.distance[index]
+        if distance <= 0:
+            return UNREACHABLE
+        # Of the neighbours one step closer, take the one most in line with the target
+        best, best_key = UNREACHABLE, None
+        for neighbour in self.navigation.neighbours(index):
+            if self.distance[neighbour] == distance - 1:
+                key = self.navigation.straight_distance(neighbour, self.target)
+                if best_key is None or key < best_key:
+                    best, best_key = neighbour, key
+        return best
+
+
+class Navigation:
+    """Flow fields towards the model's fixed destinations, kept in step with the danger layer."""
+
+    def __init__(self, width, height, danger):
+        self.width = width
+        self.height = height
+        self.blocked = bytearray(danger.cells.ravel().tobytes())
+        self.fields = {}
+        # Neighbour lists, filled in as cells are first visited
+        self._neighbours = [None] * (width * height)
+        # Bumped whenever a field changes, so array views of the fields can be cached
+        self.version = 0
+        self._tables = {}
+
+    def copy(self):
+        """An independent Navigation with the same blocked cells and fields, without recomputing them."""
+        navigation = Navigation.__new__(Navigation)
+        navigation.width = self.width
+        navigation.height = self.height
+        navigation.blocked = bytearray(self.blocked)
+        navigation.fields = {target: field.copy(navigation) for target, field in self.fields.items()}
+        # Neighbour lists never change, so the cache can be shared
+        navigation._neighbours = self._neighbours
+        navigation.version = 0
+        navigation._tables = {}
+        return navigation
+
+    def index(self, pos):
+        return pos[0] * self.height + pos[1]
+
+    def position(self, index):
+        return divmod(index, self.height)
+
+    def neighbours(self, index):
+        neighbours = self._neighbours[index]
+        if neighbours is None:
+            x, y = divmod(index, self.height)
+            neighbours = self._neighbours[index] = tuple(
+                ((x + dx) % self.width) * self.height + (y + dy) % self.height for dx, dy in MOORE_OFFSETS)
+        return neighbours
+
+    def straight_distance(self, index, target):
+        x, y = divmod(index, self.height)
+        dx = abs(x - target[0])
+        dy = abs(y - target[1])
+        dx = min(dx, self.width - dx)
+        dy = min(dy, self.height - dy)
+        return dx * dx + dy * dy
+
+    def field(self, target):
+        if target not in self.fields:
+            self.fields[target] = FlowField(self, target)
+            self.version += 1
+        return self.fields[target]
+
+    def precompute(self, targets):
+        for target in targets:
+            self.field(target)
+
+    def next_step(self, target, pos):
+        """The cell to step to from pos on the way to target, or None if there is no way through."""
+        next_cell = self.field(target).next_cell[pos[0] * self.height + pos[1]]
+        if next_cell == UNREACHABLE:
+            return None
+        return divmod(next_cell, self.height)
+
+    def block(self, positions):
+        """Mark positions as impassable and repair every field around them."""
+        indexes = [self.index(pos) for pos in positions]
+        if not indexes:
+            return
+        for index in indexes:
+            self.blocked[index] = 1
+        for field in self.fields.values():
+            field.block(indexes)
+        self.version += 1
+
+    def next_table(self, targets):
+        """next_cell for each of targets as one (len(targets), width * height) array."""
+        key = tuple(targets)
+        cached = self._tables.get(key)
+        if cached is None or cached[0] != self.version:
+            table = np.array([self.field(target).next_cell for target in targets], dtype=np.int64)
+            cached = self._tables[key] = (self.version, table)
+        return cached[1]
+
+
+class DirectNavigation:
+    """Straight steps around danger zones, for maps too large for flow fields.
+
+    Answers next_step like Navigation but keeps nothing per cell: it heads
+    straight for the target the way the military do, and where that cell is
+    a danger zone takes the first safe neighbouring cell instead. It only
+    reports a dead end when every neighbouring cell is a danger zone.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.blocked = set()
+
+    def copy(self):
+        navigation = DirectNavigation(self.width, self.height)
+        navigation.blocked = set(self.blocked)
+        return navigation
+
+    def precompute(self, targets):
+        pass
+
+    def next_step(self, target, pos):
+        """The cell to step to from pos on the way to target, or None if there is no way out."""
+        x, y = pos
+        if (x, y) == tuple(target):
+            return None
+        step = ((x + (target[0] > x) - (target[0] < x)) % self.width,
+                (y + (target[1] > y) - (target[1] < y)) % self.height)
+        if step not in self.blocked:
+            return step
+        for dx, dy in MOORE_OFFSETS:
+            step = ((x + dx) % self.width, (y + dy) % self.height)
+            if step not in self.blocked:
+                return step
+        return None
+
+    def block(self, positions):
+        self.blocked.update(tuple(pos) for pos in positions)
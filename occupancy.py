@@ -0,0 +1,111 @@
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent
+from grid import GridListener
+
+
+class OccupancyIndex(GridListener):
+    """Civilian and military occupancy per cell, plus the cells claimed as terrorist targets.
+
+    Kept up to date by the grid, so terrorists can pick targets without
+    rescanning every agent in the schedule.
+    """
+
+    def __init__(self, bucket_size=None):
+        self.civilians = {}  # pos -> unique_ids of the civilians in that cell
+        self.military = {}  # pos -> number of military agents in that cell
+        self.claimed = {}  # pos -> number of terrorists targeting that cell
+        # With bucket_size set, civilian cells are also filed by square block, so that
+        # closest_target searches outwards from the terrorist instead of scanning them all
+        self.bucket_size = bucket_size
+        self.buckets = {}  # (bx, by) -> civilian cells in that block
+
+    def on_place(self, agent, pos):
+        if isinstance(agent, CivilianAgent):
+            if pos not in self.civilians and self.bucket_size:
+                self.buckets.setdefault(self.bucket_of(pos), set()).add(pos)
+            self.civilians.setdefault(pos, set()).add(agent.unique_id)
+        elif isinstance(agent, MilitaryAgent):
+            self.military[pos] = self.military.get(pos, 0) + 1
+
+    def on_remove(self, agent, pos):
+        if isinstance(agent, CivilianAgent):
+            ids = self.civilians[pos]
+            ids.discard(agent.unique_id)
+            if not ids:
+                del self.civilians[pos]
+                if self.bucket_size:
+                    key = self.bucket_of(pos)
+                    self.buckets[key].discard(pos)
+                    if not self.buckets[key]:
+                        del self.buckets[key]
+        elif isinstance(agent, MilitaryAgent):
+            self._decrement(self.military, pos)
+        elif isinstance(agent, TerroristAgent) and agent.target:
+            # A dead terrorist no longer holds on to its target
+            self.release(agent.target)
+
+    def on_move(self, agent, old_pos, new_pos):
+        if isinstance(agent, (CivilianAgent, MilitaryAgent)):
+            self.on_remove(agent, old_pos)
+            self.on_place(agent, new_pos)
+
+    def claim(self, pos):
+        self.claimed[pos] = self.claimed.get(pos, 0) + 1
+
+    def release(self, pos):
+        self._decrement(self.claimed, pos)
+
+    def civilian_count(self, pos):
+        return len(self.civilians.get(pos, ()))
+
+    def military_count(self, pos):
+        return self.military.get(pos, 0)
+
+    def potential_targets(self):
+        # Cells with civilians, fewer than 4 military agents and no terrorist already heading there
+        return [pos for pos in self.civilians
+                if self.military.get(pos, 0) < 4 and pos not in self.claimed]
+
+    def bucket_of(self, pos):
+        return (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+
+    def closest_target(self, pos, distance):
+        if self.bucket_size:
+            return self.closest_bucketed_target(pos, distance)
+        targets = self.potential_targets()
+        if not targets:
+            return None
+        # Ties go to the cell whose first civilian comes first in the schedule,
+        # which is the order a full scan of schedule.agents would find them in.
+        return min(targets, key=lambda target: (distance(pos, target), min(self.civilians[target])))
+
+    def closest_bucketed_target(self, pos, distance):
+        """closest_target by rings of blocks around pos; distance must be the plain Manhattan distance."""
+        size = self.bucket_size
+        bx, by = self.bucket_of(pos)
+        best, best_key = None, None
+        seen = 0
+        ring = 0
+        while seen < len(self.civilians):
+            # Every cell in this ring of blocks is at least this far away
+            if best is not None and (ring - 1) * size + 1 > best_key[0]:
+                break
+            for dx in range(-ring, ring + 1):
+                for dy in range(-ring, ring + 1) if abs(dx) == ring else (-ring, ring):
+                    cells = self.buckets.get((bx + dx, by + dy))
+                    if not cells:
+                        continue
+                    seen += len(cells)
+                    for target in cells:
+                        if self.military.get(target, 0) < 4 and target not in self.claimed:
+                            key = (distance(pos, target), min(self.civilians[target]))
+                            if best_key is None or key < best_key:
+                                best, best_key = target, key
+            ring += 1
+        return best
+
+    @staticmethod
+    def _decrement(counts, pos):
+        if counts[pos] == 1:
+            del counts[pos]
+        else:
+            counts[pos] -= 1
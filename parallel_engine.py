@@ -0,0 +1,558 @@
+import multiprocessing
+import os
+import traceback
+import weakref
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from mesa import Model
+from mesa.time import BaseScheduler
+
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent
+from array_model import (DEAD, CIVILIAN, MILITARY, TERRORIST, AGENT_TYPES, BLAST_OFFSETS, NAVIGATION_MAX_CELLS,
+                         avoid_danger, civilian_steps, in_ring, ring_replay, steps_towards)
+from collection import CAUSES, StreamCollector
+from danger import DangerLayer, SparseDangerLayer
+from density import BLAST_TRIGGER_OFFSETS, cell_counts, wrapped_box_sum
+from model import WarZoneModel, AGENT_LABELS, CROWDED_AREAS, HIGH_VALUE_AREAS, scale_areas
+from navigation import Navigation
+from reporting import DEFAULT_SINKS, make_sinks
+from seeding import fresh_seed, replica_seeds
+from targeting import greedy_assignment, nearest_source
+
+# Columns each side of a tile that its neighbours share: the blast trigger's radius,
+# which also covers the encirclement ring and the blast itself
+HALO = 2
+# Per-agent columns, as tiles hold them and as migrating agents are written to shared memory
+FIELDS = ["unique_id", "kind", "x", "y", "target_area", "target_x", "target_y", "sub_round"]
+# Layers of a halo: civilians plus military, military, danger zones
+PEOPLE, SOLDIERS, DANGER = range(3)
+LEFT, RIGHT = 0, 1
+# Columns of the shared terrorist table, one row per terrorist by unique_id less the first one's
+ALIVE, X, Y = range(3)
+
+
+def shared_layout(tiles, width, height, capacity, terrorists, navigation):
+    """{name: (shape, dtype, offset)} of the buffers in the engine's shared memory block."""
+    shapes = {
+        # Every terrorist's position, written by the tile that holds it and read by every tile's military
+        "terrorists": ((max(terrorists, 1), 3), np.int64),
+        # Per tile, how many of its soldiers stepped into and out of the ring around each
+        # terrorist, and how many hunted it, indexed as the terrorist table
+        "hunts": ((tiles, max(terrorists, 1), 3), np.int32),
+        # Each tile's HALO edge columns on either side, written by the tile and read by its neighbours
+        "halo": ((tiles, 2, 3, HALO, height), np.int32),
+        # Cells just across either border that the tile's blasts hit
+        "blast": ((tiles, 2, height), np.uint8),
+        # Agents leaving the tile across either border
+        "migrants": ((tiles, 2, capacity, len(FIELDS)), np.int64),
+        "migrant_counts": ((tiles, 2), np.int64),
+    }
+    if navigation:
+        # Danger zones of the whole map, for every tile's flow fields
+        shapes["danger"] = ((width, height), np.uint8)
+    layout, offset = {}, 0
+    for name, (shape, dtype) in shapes.items():
+        layout[name] = (shape, dtype, offset)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+def shared_arrays(buffer, layout):
+    return {name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            for name, (shape, dtype, offset) in layout.items()}
+
+
+class Tile:
+    """The agents and cells of one strip of columns, x0 <= x < x1, stepped by one worker process.
+
+    Cell arrays cover the strip plus HALO columns on each side; local column
+    HALO is global column x0. Agent positions stay global. A lone tile spans
+    the whole map, and its halos hold copies of its own opposite edges.
+    """
+
+    def __init__(self, index, bounds, height, areas, navigation, first_terrorist, seed, max_assignment_rounds,
+                 shared, barrier, rows):
+        self.index = index
+        self.tiles = len(bounds) - 1
+        self.x0, self.x1 = bounds[index], bounds[index + 1]
+        self.bounds = bounds
+        self.width = bounds[-1]
+        self.height = height
+        self.strip = self.x1 - self.x0
+        self.crowded_areas = areas
+        self.navigation = navigation
+        # The danger zones navigation has been told about
+        self.known_danger = DangerLayer(self.width, height) if navigation else None
+        self.first_terrorist = first_terrorist
+        self.rng = np.random.default_rng(seed)
+        self.max_assignment_rounds = max_assignment_rounds
+        self.shared = shared
+        self.barrier = barrier
+        self.agents = {name: rows[:, column].copy() for column, name in enumerate(FIELDS)}
+        self.layers = np.zeros((3, self.strip + 2 * HALO, height), dtype=np.int32)
+        self.current = 0
+        self.casualties = []
+        self.fresh_danger = []
+
+    def local(self, x):
+        offset = (x - self.x0) % self.width
+        # Only columns past the right halo lie in the left one, so a lone tile never wraps its own
+        return np.where(offset < self.strip + HALO, offset, offset - self.width) + HALO
+
+    def members(self, kind, active=False):
+        if active:
+            return np.flatnonzero((self.agents["kind"] == kind) & (self.agents["sub_round"] == self.current))
+        return np.flatnonzero(self.agents["kind"] == kind)
+
+    def step(self, phase_orders, targeted_tiles):
+        """One step, in sub-rounds whose populations take turns in phase_orders, the same on every tile.
+
+        As in ArrayWarZoneModel, every agent is dealt into one sub-round,
+        and keeps it when it crosses into another tile.
+        """
+        self.casualties, self.fresh_danger = [], []
+        self.agents["sub_round"] = self.rng.integers(0, len(phase_orders), len(self.agents["kind"]))
+        phases = [self.move_civilians, self.move_military, partial(self.move_terrorists, targeted_tiles)]
+        for self.current, order in enumerate(phase_orders):
+            for index in order:
+                phases[index]()
+        keep = self.agents["kind"] != DEAD
+        self.agents = {name: values[keep] for name, values in self.agents.items()}
+        return self.report()
+
+    def count_layers(self):
+        agents = self.agents
+        for layer, kinds in ((PEOPLE, (CIVILIAN, MILITARY)), (SOLDIERS, (MILITARY,))):
+            chosen = np.flatnonzero(np.isin(agents["kind"], kinds))
+            self.layers[layer] = cell_counts(self.local(agents["x"][chosen]), agents["y"][chosen],
+                                             self.strip + 2 * HALO, self.height)
+
+    def exchange_halos(self):
+        """Recount the strip, then swap edge columns with both neighbours."""
+        self.count_layers()
+        halo = self.shared["halo"]
+        halo[self.index, LEFT] = self.layers[:, HALO:2 * HALO]
+        halo[self.index, RIGHT] = self.layers[:, self.strip:self.strip + HALO]
+        self.barrier.wait()
+        left, right = (self.index - 1) % self.tiles, (self.index + 1) % self.tiles
+        self.layers[:, :HALO] = halo[left, RIGHT]
+        self.layers[:, self.strip + HALO:] = halo[right, LEFT]
+        self.barrier.wait()
+
+    def migrate(self):
+        """Hand agents that stepped over a border to the neighbouring tile."""
+        agents = self.agents
+        local = self.local(agents["x"])
+        alive = agents["kind"] != DEAD
+        leaving = {LEFT: alive & (local < HALO), RIGHT: alive & (local >= HALO + self.strip)}
+        migrants, counts = self.shared["migrants"], self.shared["migrant_counts"]
+        for side, chosen in leaving.items():
+            rows = np.stack([agents[name][chosen] for name in FIELDS], axis=1)
+            if len(rows) > migrants.shape[2]:
+                raise RuntimeError(f"{len(rows)} agents crossing one tile border; raise migration_capacity")
+            migrants[self.index, side, :len(rows)] = rows
+            counts[self.index, side] = len(rows)
+        self.barrier.wait()
+        stay = ~(leaving[LEFT] | leaving[RIGHT])
+        arrivals = [migrants[(self.index - 1) % self.tiles, RIGHT, :counts[(self.index - 1) % self.tiles, RIGHT]],
+                    migrants[(self.index + 1) % self.tiles, LEFT, :counts[(self.index + 1) % self.tiles, LEFT]]]
+        self.agents = {name: np.concatenate([agents[name][stay]] + [rows[:, column] for rows in arrivals])
+                       for column, name in enumerate(FIELDS)}
+        self.barrier.wait()
+
+    def is_danger(self, x, y):
+        return self.layers[DANGER][self.local(x), y] > 0
+
+    def move_civilians(self):
+        agents = self.agents
+        if self.navigation:
+            # Catch up with the danger zones every tile's blasts have made
+            known = self.known_danger
+            fresh = np.argwhere((self.shared["danger"] > 0) & ~known.cells)
+            if len(fresh):
+                self.navigation.block(known.stamp(fresh))
+        civilians = self.members(CIVILIAN, active=True)
+        area = agents["target_area"][civilians]
+        agents["x"][civilians], agents["y"][civilians] = civilian_steps(
+            agents["x"][civilians], agents["y"][civilians], area, self.crowded_areas, self.navigation, self.rng,
+            self.width, self.height, self.is_danger)
+        agents["target_area"][civilians] = area
+        self.migrate()
+
+    def move_military(self):
+        agents = self.agents
+        military = self.members(MILITARY, active=True)
+        hunts = self.shared["hunts"][self.index]
+        hunts[:] = 0
+        table = self.shared["terrorists"]
+        terrorists = np.flatnonzero(table[:, ALIVE])
+        if len(military) and len(terrorists):
+            x, y = agents["x"][military], agents["y"][military]
+            hunted = terrorists[self.nearest_terrorists(x, y, table[terrorists, X], table[terrorists, Y])]
+            hunted_x, hunted_y = table[hunted, X], table[hunted, Y]
+            next_x, next_y = steps_towards(x, y, hunted_x, hunted_y)
+            agents["x"][military], agents["y"][military] = avoid_danger(x, y, next_x, next_y, self.width,
+                                                                        self.height, self.is_danger)
+            # The terrorist's own tile replays these moves when it checks the ring
+            was_around = in_ring(x, y, hunted_x, hunted_y, self.width, self.height)
+            is_around = in_ring(agents["x"][military], agents["y"][military], hunted_x, hunted_y,
+                                self.width, self.height)
+            np.add.at(hunts[:, 0], hunted[is_around & ~was_around], 1)
+            np.add.at(hunts[:, 1], hunted[was_around & ~is_around], 1)
+            np.add.at(hunts[:, 2], hunted, 1)
+        self.migrate()
+        self.exchange_halos()
+        self.encircle()
+
+    def nearest_terrorists(self, x, y, terrorist_x, terrorist_y):
+        """Index of the terrorist nearest each soldier at (x, y), as nearest_source over the whole map finds it.
+
+        Only the terrorists within the strip and its halos are searched at
+        first. Soldiers that may have a nearer one outside them are checked
+        against every terrorist.
+        """
+        lo, hi = max(0, self.x0 - HALO), min(self.width, self.x1 + HALO)
+        near = np.flatnonzero((terrorist_x >= lo) & (terrorist_x < hi))
+        if not len(near):
+            label, _ = nearest_source(self.width, self.height, terrorist_x, terrorist_y)
+            return label[x, y]
+        label, distance = nearest_source(hi - lo, self.height, terrorist_x[near] - lo, terrorist_y[near])
+        nearest = near[label[x - lo, y]]
+        # How far the closest terrorist outside could be
+        bound = np.full(len(x), self.width + self.height)
+        if lo > 0:
+            bound = np.minimum(bound, x - lo + 1)
+        if hi < self.width:
+            bound = np.minimum(bound, hi - x)
+        unsure = np.flatnonzero(distance[x - lo, y] >= bound)
+        if len(unsure) * len(terrorist_x) <= self.width * self.height:
+            # Few enough to measure directly
+            gaps = np.abs(x[unsure, None] - terrorist_x) + np.abs(y[unsure, None] - terrorist_y)
+            nearest[unsure] = gaps.argmin(axis=1)
+        else:
+            label, _ = nearest_source(self.width, self.height, terrorist_x, terrorist_y)
+            nearest[unsure] = label[x[unsure], y[unsure]]
+        return nearest
+
+    def encircle(self):
+        """Check the rings around this tile's hunted terrorists, as ArrayWarZoneModel does.
+
+        Hunters report only how many of them stepped into and out of each ring,
+        so those steps are laid out per hunter before ring_replay shuffles them.
+        """
+        terrorists = self.members(TERRORIST)
+        slots = self.agents["unique_id"][terrorists] - self.first_terrorist
+        entered, left, hunters = self.shared["hunts"][:, slots].sum(axis=0).T
+        if hunters.any():
+            self.catch(terrorists, entered, left, hunters)
+        # Hunts are cleared and the terrorist table read again by the next military turn
+        self.barrier.wait()
+
+    def catch(self, terrorists, entered, left, hunters):
+        """Remove those of terrorists whose ring held at least 4 military agents at any point of the turn."""
+        agents = self.agents
+        hunted = np.repeat(np.arange(len(terrorists)), hunters)
+        place = np.arange(len(hunted)) - np.repeat(np.cumsum(hunters) - hunters, hunters)
+        delta = np.where(place < entered[hunted], 1, np.where(place < (entered + left)[hunted], -1, 0))
+        targets, peak, change = ring_replay(hunted, delta, self.rng)
+        soldiers = self.layers[SOLDIERS]
+        targets = terrorists[targets]
+        surrounding = (wrapped_box_sum(soldiers, 1) - soldiers)[self.local(agents["x"][targets]),
+                                                                agents["y"][targets]]
+        caught = targets[surrounding - change + peak >= 4]
+        self.shared["terrorists"][agents["unique_id"][caught] - self.first_terrorist, ALIVE] = 0
+        self.remove(caught, "military")
+
+    def move_terrorists(self, targeted_tiles):
+        # Targets may lie just over a border, so the neighbours' civilians are needed as they are now
+        self.exchange_halos()
+        agents = self.agents
+        terrorists = self.members(TERRORIST, active=True)
+        if len(terrorists):
+            x, y = agents["x"][terrorists], agents["y"][terrorists]
+            # The strip and its halos, short of the map's seam, across which the array engine doesn't look either
+            lo = HALO if self.x0 == 0 else 0
+            hi = self.strip + HALO if self.x1 == self.width else self.strip + 2 * HALO
+            people, soldiers = self.layers[PEOPLE, lo:hi], self.layers[SOLDIERS, lo:hi]
+            candidates = (people > soldiers) & (soldiers < 4)
+            # Cells other terrorists here are heading for, and our own last targets, are taken,
+            # as they are for the agent classes
+            claimed = self.members(TERRORIST)
+            claimed = claimed[agents["target_x"][claimed] >= 0]
+            claimed_x = self.local(agents["target_x"][claimed]) - lo
+            inside = (claimed_x >= 0) & (claimed_x < hi - lo)
+            candidates[claimed_x[inside], agents["target_y"][claimed[inside]]] = False
+            target_x, target_y = greedy_assignment(hi - lo, self.height, self.local(x) - lo, y, candidates,
+                                                   self.max_assignment_rounds)
+            found = target_x >= 0
+            target_x[found] = (target_x[found] + lo - HALO + self.x0) % self.width
+            # Terrorists with nothing left to target here head for the nearest tile that has targets
+            lost = ~found & (len(targeted_tiles) > 0)
+            if lost.any():
+                tiles = np.array(targeted_tiles)
+                steps = np.abs(tiles - self.index)
+                tile = tiles[np.minimum(steps, self.tiles - steps).argmin()]
+                target_x[lost] = (self.bounds[tile] + self.bounds[tile + 1]) // 2
+                target_y[lost] = y[lost]
+            agents["target_x"][terrorists], agents["target_y"][terrorists] = target_x, target_y
+            moving = target_x >= 0
+            next_x, next_y = steps_towards(x[moving], y[moving], target_x[moving], target_y[moving])
+            agents["x"][terrorists[moving]] = next_x % self.width
+            agents["y"][terrorists[moving]] = next_y % self.height
+        self.migrate()
+        # Every tile's military reads the new positions, after the barriers to come
+        agents = self.agents
+        mine = self.members(TERRORIST)
+        table = self.shared["terrorists"]
+        table[agents["unique_id"][mine] - self.first_terrorist, X] = agents["x"][mine]
+        table[agents["unique_id"][mine] - self.first_terrorist, Y] = agents["y"][mine]
+        self.exchange_halos()
+        self.detonate(self.members(TERRORIST, active=True))
+        # Bring the neighbours' new danger zones into the halos
+        self.exchange_halos()
+
+    def detonate(self, terrorists):
+        agents = self.agents
+        counts = self.layers[PEOPLE].copy()
+        density = wrapped_box_sum(counts, 2) - counts
+        x, y = self.local(agents["x"][terrorists]), agents["y"][terrorists]
+        triggered = np.flatnonzero(density[x, y] > 14)
+        blasted = np.zeros_like(counts, dtype=bool)
+        for index in self.rng.permutation(triggered):
+            # Recount, since earlier blasts this step may have thinned the crowd
+            if counts[x[index] + BLAST_TRIGGER_OFFSETS[:, 0],
+                      (y[index] + BLAST_TRIGGER_OFFSETS[:, 1]) % self.height].sum() <= 14:
+                continue
+            footprint = (x[index] + BLAST_OFFSETS[:, 0], (y[index] + BLAST_OFFSETS[:, 1]) % self.height)
+            counts[footprint] = 0
+            blasted[footprint] = True
+        # Blasts reach one column over the border; the neighbours apply those cells themselves
+        blast = self.shared["blast"]
+        blast[self.index, LEFT] = blasted[HALO - 1]
+        blast[self.index, RIGHT] = blasted[HALO + self.strip]
+        self.barrier.wait()
+        blasted[HALO] |= blast[(self.index - 1) % self.tiles, RIGHT].astype(bool)
+        blasted[HALO + self.strip - 1] |= blast[(self.index + 1) % self.tiles, LEFT].astype(bool)
+        own = np.zeros_like(blasted)
+        own[HALO:HALO + self.strip] = blasted[HALO:HALO + self.strip]
+        fresh = own & (self.layers[DANGER] == 0)
+        self.layers[DANGER][fresh] = 1
+        fresh_x, fresh_y = np.nonzero(fresh)
+        fresh_x = (fresh_x - HALO + self.x0) % self.width
+        self.fresh_danger.extend(np.stack([fresh_x, fresh_y], axis=1).tolist())
+        if self.navigation:
+            self.shared["danger"][fresh_x, fresh_y] = 1
+        self.barrier.wait()
+        people = np.flatnonzero((agents["kind"] == CIVILIAN) | (agents["kind"] == MILITARY))
+        self.remove(people[own[self.local(agents["x"][people]), agents["y"][people]]], "blast")
+
+    def remove(self, indices, cause):
+        agents = self.agents
+        self.casualties.extend(zip(agents["kind"][indices].tolist(), agents["x"][indices].tolist(),
+                                   agents["y"][indices].tolist(), [CAUSES.index(cause)] * len(indices)))
+        agents["kind"][indices] = DEAD
+
+    def report(self):
+        agents = self.agents
+        civilians = self.members(CIVILIAN)
+        own = slice(HALO, HALO + self.strip)
+        civilian_counts = cell_counts(self.local(agents["x"][civilians]), agents["y"][civilians],
+                                      self.strip + 2 * HALO, self.height)[own]
+        return {
+            "populations": [len(self.members(kind)) for kind in (CIVILIAN, MILITARY, TERRORIST)],
+            "casualties": self.casualties,
+            "danger": self.fresh_danger,
+            "has_targets": bool(((civilian_counts > 0) & (self.layers[SOLDIERS, own] < 4)).any()),
+        }
+
+
+def _work(index, bounds, height, areas, navigation, first_terrorist, seed, max_assignment_rounds, shared_name,
+          layout, barrier, rows, connection):
+    memory = SharedMemory(name=shared_name)
+    tile = None
+    try:
+        tile = Tile(index, bounds, height, areas, navigation, first_terrorist, seed, max_assignment_rounds,
+                    shared_arrays(memory.buf, layout), barrier, rows)
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+            try:
+                connection.send(("ok", tile.step(*message)))
+            except Exception:
+                # Release the other tiles from the barrier, then stop
+                barrier.abort()
+                connection.send(("error", traceback.format_exc()))
+                break
+    finally:
+        del tile
+        memory.close()
+
+
+def _shutdown(processes, connections, memory):
+    for connection in connections:
+        try:
+            connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join()
+    memory.close()
+    memory.unlink()
+
+
+class ParallelSchedule(BaseScheduler):
+    """Steps every tile of a ParallelWarZoneModel once."""
+
+    def step(self):
+        self.model.advance_tiles()
+        super().step()
+
+    def get_agent_count(self):
+        return sum(self.model.population.values())
+
+
+class ParallelWarZoneModel(Model):
+    """The array engine's rules, with the torus split into strips of columns stepped by worker processes.
+
+    Each of workers processes owns the agents in one strip. Steps run in
+    sub-rounds as in ArrayWarZoneModel, with the populations taking turns in
+    the same random order on every tile. Between turns the tiles swap
+    HALO-column edges of their people, military and danger counts through
+    shared memory, so blast triggers and encirclements near a border see both
+    sides of it, and pass on agents that stepped across. Blasts that reach over
+    a border are applied by the tile that owns those cells. Terrorist positions
+    are shared as they move, for the military to hunt; the model collects the
+    populations, casualties and danger zones of the whole map after each step,
+    and which tiles still have targets for terrorists that have none left in
+    their own strip, where they pick them.
+
+    Civilians follow flow fields as in ArrayWarZoneModel, with every tile
+    keeping its own copy in step with the danger zones of the whole map.
+    Results match the array engine statistically, as test_engines.py checks,
+    and repeat exactly for the same seed and workers. Each strip needs at
+    least 2 * HALO columns; by default there is a worker per core, or as many
+    as the map has room for. Call close() to stop the workers early; they stop
+    by themselves when the run ends.
+    """
+    def __init__(self, num_civilians, num_military, num_terrorists, width=30, height=30,
+                 crowded_areas=None, high_value_areas=None, seed=None, workers=None, sub_rounds=4,
+                 max_assignment_rounds=8, navigation=None, migration_capacity=None, show_report=True, collector=None,
+                 report_sinks=None):
+        self.num_civilians = num_civilians
+        self.num_military = num_military
+        self.num_terrorists = num_terrorists
+        self.width = width
+        self.height = height
+        self.seed = seed if seed is not None else fresh_seed()
+        self.rng = np.random.default_rng(self.seed)
+        self.schedule = ParallelSchedule(self)
+        self.running = True
+        self.show_report = show_report
+        self.report_sinks = make_sinks(DEFAULT_SINKS if report_sinks is None else report_sinks)
+        self.sub_rounds = sub_rounds
+        if workers is None:
+            # One per core, as many as the map has room for
+            workers = max(1, min(os.cpu_count(), width // (2 * HALO)))
+        bounds = np.linspace(0, width, workers + 1).astype(int)
+        if workers > 1 and np.diff(bounds).min() < 2 * HALO:
+            raise ValueError(f"a {width}-column map can't be split into {workers} strips of {2 * HALO} or more")
+
+        self.crowded_areas = crowded_areas or scale_areas(CROWDED_AREAS, width, height)
+        self.high_value_areas = high_value_areas or scale_areas(HIGH_VALUE_AREAS, width, height)
+
+        self.initial_civilians = num_civilians
+        self.initial_military = num_military
+        self.initial_terrorists = num_terrorists
+        self.danger_zones_created = 0
+        self.population = {CivilianAgent: num_civilians, MilitaryAgent: num_military,
+                           TerroristAgent: num_terrorists}
+        self.danger = SparseDangerLayer(width, height)
+        # The same choice as ArrayWarZoneModel's; the workers start from copies of these flow fields
+        if navigation is None:
+            navigation = width * height <= NAVIGATION_MAX_CELLS
+        if navigation:
+            navigation = Navigation(width, height, DangerLayer(width, height))
+            navigation.precompute(self.crowded_areas)
+
+        # Agents are placed as ArrayWarZoneModel places them, then dealt out by column
+        total = num_civilians + num_military + num_terrorists
+        kind = np.repeat(np.array([CIVILIAN, MILITARY, TERRORIST]), [num_civilians, num_military, num_terrorists])
+        x = self.rng.integers(0, width, total)
+        y = self.rng.integers(0, height, total)
+        target_area = np.where(kind == CIVILIAN, self.rng.integers(0, len(self.crowded_areas), total), -1)
+        rows = np.stack([np.arange(total), kind, x, y, target_area, np.full(total, -1), np.full(total, -1),
+                         np.zeros(total, dtype=int)], axis=1)
+        tile_of = np.searchsorted(bounds, x, side="right") - 1
+
+        capacity = migration_capacity or max(4096, 16 * total // width)
+        layout, size = shared_layout(workers, width, height, capacity, num_terrorists, navigation)
+        memory = SharedMemory(create=True, size=size)
+        table = shared_arrays(memory.buf, layout)["terrorists"]
+        table[:num_terrorists] = np.stack([np.ones(num_terrorists, dtype=int), x[kind == TERRORIST],
+                                           y[kind == TERRORIST]], axis=1)
+        # Let go of the view, or the shared memory can't be closed
+        del table
+        barrier = multiprocessing.Barrier(workers)
+        self.connections, processes = [], []
+        for index, seed in enumerate(replica_seeds(self.seed, workers)):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_work, daemon=True,
+                args=(index, bounds.tolist(), height, self.crowded_areas, navigation or None,
+                      num_civilians + num_military, seed, max_assignment_rounds, memory.name, layout, barrier,
+                      rows[tile_of == index], child))
+            process.start()
+            self.connections.append(parent)
+            processes.append(process)
+        self._shutdown = weakref.finalize(self, _shutdown, processes, self.connections, memory)
+
+        self.targeted_tiles = list(range(workers))
+        self.datacollector = collector or StreamCollector()
+        self.report = None
+
+    def step(self):
+        self.datacollector.collect(self)
+        self.schedule.step()
+        self.check_for_report()
+
+    def advance_tiles(self):
+        phase_orders = np.array([self.rng.permutation(3) for _ in range(self.sub_rounds)])
+        for connection in self.connections:
+            connection.send((phase_orders, self.targeted_tiles))
+        replies = [connection.recv() for connection in self.connections]
+        errors = [reply for status, reply in replies if status == "error"]
+        if errors:
+            self.close()
+            raise RuntimeError("a tile worker failed:\n" + "\n".join(errors))
+        reports = [reply for _, reply in replies]
+
+        for kind, agent_type in AGENT_TYPES.items():
+            self.population[agent_type] = sum(report["populations"][kind] for report in reports)
+        for report in reports:
+            for kind, x, y, cause in report["casualties"]:
+                self.datacollector.record_casualty(self.schedule.steps, AGENT_LABELS[AGENT_TYPES[kind]], (x, y),
+                                                   CAUSES[cause])
+        fresh = [pos for report in reports for pos in report["danger"]]
+        if fresh:
+            self.danger.stamp(fresh)
+        self.danger_zones_created = self.danger.count
+        self.targeted_tiles = [index for index, report in enumerate(reports) if report["has_targets"]]
+
+    def check_for_report(self):
+        WarZoneModel.check_for_report(self)
+        if not self.running:
+            self.close()
+
+    def close(self):
+        """Stop the worker processes and free the shared memory."""
+        self._shutdown()
+
+    generate_report = WarZoneModel.generate_report
+    count_type = staticmethod(WarZoneModel.count_type)
+    populations = WarZoneModel.populations
+    civilian_casualties = WarZoneModel.civilian_casualties
+    military_casualties = WarZoneModel.military_casualties
+    terrorist_casualties = WarZoneModel.terrorist_casualties
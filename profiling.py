@@ -0,0 +1,127 @@
+import argparse
+import time
+from collections import defaultdict
+
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent
+
+# Methods timed on each agent, under "<label>.<method>"
+AGENT_METHODS = {
+    CivilianAgent: ("Civilian", ["step", "move_towards"]),
+    MilitaryAgent: ("Military", ["step", "find_terrorist_agent", "move_towards",
+                                 "check_and_remove_terrorist_agent"]),
+    TerroristAgent: ("Terrorist", ["step", "update_target", "move_towards_target", "check_and_remove_agents"]),
+}
+# Queries against the grid and the model's indexes, timed and counted under "<attribute>.<method>"
+QUERIES = {
+    "grid": ["get_neighborhood", "get_neighbors", "get_cell_list_contents", "is_cell_empty", "out_of_bounds",
+             "move_agent"],
+    "occupancy": ["closest_target"],
+    "terrorists": ["nearest"],
+    "density": ["crowd_around"],
+    "danger": ["is_danger"],
+    "navigation": ["next_step"],
+}
+
+
+class Profiler:
+    """Wall time and call counts for the model's phases, agent methods and grid queries.
+
+    Created by WarZoneModel(..., profile=True), which wraps the methods listed
+    above on its own instances only; an unprofiled model runs untouched code.
+    Times are inclusive: a method's time includes the queries it makes.
+    """
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        # Self time in microseconds per call stack, for flamegraph.pl and speedscope
+        self.folded = defaultdict(float)
+        # Inclusive seconds per name for each completed step, with its step number under "step"
+        self.series = []
+        self._step = defaultdict(float)
+        # [stack path, seconds spent in children] for every call in progress
+        self._stack = []
+
+    def wrap(self, name, method):
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            stack = self._stack
+            path = f"{stack[-1][0]};{name}" if stack else name
+            frame = [path, 0.0]
+            stack.append(frame)
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stack.pop()
+                if stack:
+                    stack[-1][1] += elapsed
+                self.calls[name] += 1
+                self.seconds[name] += elapsed
+                self._step[name] += elapsed
+                self.folded[path] += (elapsed - frame[1]) * 1e6
+        return timed
+
+    def instrument(self, owner, name, methods):
+        for method in methods:
+            setattr(owner, method, self.wrap(f"{name}.{method}", getattr(owner, method)))
+
+    def instrument_model(self, model):
+        step = self.wrap("model.step", model.step)
+
+        def profiled_step():
+            step()
+            self.series.append(dict(self._step, step=model.schedule.steps))
+            self._step.clear()
+
+        model.step = profiled_step
+        self.instrument(model, "model", ["assign_targets", "check_for_report", "remove_agent", "create_danger_zones"])
+        self.instrument(model.datacollector, "datacollector", ["collect"])
+        if model.squads:
+            self.instrument(model.squads, "squads", ["update"])
+        for attribute, methods in QUERIES.items():
+            self.instrument(getattr(model, attribute), attribute, methods)
+
+    def instrument_agent(self, agent):
+        label, methods = AGENT_METHODS.get(type(agent), (None, []))
+        if label:
+            self.instrument(agent, label, methods)
+
+    def totals(self):
+        """{name: {"calls": ..., "seconds": ...}} for everything timed so far, slowest first."""
+        return {name: {"calls": self.calls[name], "seconds": seconds}
+                for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1])}
+
+    def query_counts(self):
+        return {name: calls for name, calls in self.calls.items() if name.split(".")[0] in QUERIES}
+
+    def dump_folded(self, path):
+        """Write the call stacks in folded format, one "a;b;c microseconds" line each."""
+        with open(path, "w") as file:
+            for stack, microseconds in sorted(self.folded.items()):
+                file.write(f"{stack} {round(microseconds)}\n")
+
+
+if __name__ == "__main__":
+    from model import WarZoneModel
+
+    parser = argparse.ArgumentParser(description="Profile a headless WarZoneModel run.")
+    parser.add_argument("--civilians", type=int, default=200)
+    parser.add_argument("--military", type=int, default=100)
+    parser.add_argument("--terrorists", type=int, default=50)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--folded", help="also write folded call stacks here, for a flamegraph")
+    args = parser.parse_args()
+    model = WarZoneModel(args.civilians, args.military, args.terrorists, seed=args.seed, show_report=False,
+                         profile=True)
+    while model.running and model.schedule.steps < args.steps:
+        model.step()
+    print(f"{'name':<42} {'calls':>8} {'total ms':>10} {'us/call':>9}")
+    for name, total in model.profiler.totals().items():
+        print(f"{name:<42} {total['calls']:>8} {total['seconds'] * 1000:>10.1f} "
+              f"{total['seconds'] / total['calls'] * 1e6:>9.1f}")
+    if args.folded:
+        model.profiler.dump_folded(args.folded)
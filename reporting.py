@@ -0,0 +1,62 @@
+import json
+
+
+class StdoutReport:
+    """Prints the report, one section per line."""
+
+    def write(self, report):
+        print("Simulation Report:")
+        for key, value in report.items():
+            print(f"{key}: {value}")
+        print("All Done!")
+
+
+class JsonReport:
+    """Writes the report as one line of JSON, appended to path, or printed when there is no path."""
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def write(self, report):
+        line = json.dumps(report)
+        if self.path is None:
+            print(line)
+        else:
+            with open(self.path, "a") as file:
+                file.write(line + "\n")
+
+
+class GuiReport:
+    """Shows the report in a message box.
+
+    tkinter is only imported once there is a report to show, and machines
+    without it or without a display skip the box.
+    """
+
+    def write(self, report):
+        try:
+            import tkinter
+            from report_element import display_report
+        except ImportError:
+            return
+        try:
+            display_report(report)
+        except tkinter.TclError:
+            pass
+
+
+REPORT_SINKS = {"stdout": StdoutReport, "json": JsonReport, "gui": GuiReport}
+# Where WarZoneModel sends its report unless told otherwise
+DEFAULT_SINKS = ["stdout", "gui"]
+
+
+def make_sinks(sinks):
+    """Sinks for a list of sink objects and names from REPORT_SINKS."""
+    made = []
+    for sink in sinks:
+        if isinstance(sink, str):
+            if sink not in REPORT_SINKS:
+                raise ValueError(f"unknown report sink {sink!r}")
+            sink = REPORT_SINKS[sink]()
+        made.append(sink)
+    return made
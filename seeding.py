@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def fresh_seed():
+    """A new seed from the operating system's entropy, for runs started without one."""
+    return int(np.random.SeedSequence().entropy)
+
+
+def replica_seeds(seed, replicas):
+    """Seeds for independent replicas, all derived from one root seed.
+
+    numpy's SeedSequence spreads the children across the generator's state
+    space, so replicas don't share a stream the way seeds 0, 1, 2... can.
+    """
+    children = np.random.SeedSequence(seed).spawn(replicas)
+    return [int(child.generate_state(2, np.uint32).view(np.uint64)[0]) for child in children]
@@ -1,9 +1,11 @@
-from mesa.visualization.modules import CanvasGrid
+import argparse
+
 from mesa.visualization.ModularVisualization import ModularServer
 from mesa.visualization.modules import ChartModule
 from mesa.visualization.UserParam import UserSettableParameter
 from model import WarZoneModel
 from agents import CivilianAgent, MilitaryAgent, TerroristAgent, OrangeCell
+from visualization import DeltaCanvasGrid
 
 def agent_portrayal(agent):
     """
@@ -23,33 +25,62 @@ def agent_portrayal(agent):
 # Define grid size
 grid_width = 30
 grid_height = 30
+# Largest side of the canvas, in pixels
+canvas_size = 500
+
+
+def create_server(width=grid_width, height=grid_height, sparse=False, crowded_areas=None, high_value_areas=None,
+                  heatmap_threshold=2000, max_fps=10):
+    """A ModularServer for a width x height map; the map settings are fixed, the populations are sliders.
+
+    Above heatmap_threshold agents the grid is drawn as a density heatmap, and
+    the browser redraws it at most max_fps times a second.
+    """
+    scale = canvas_size / max(width, height)
+    # Create a grid visualization that only sends the cells that change
+    grid = DeltaCanvasGrid(agent_portrayal, width, height, round(width * scale), round(height * scale),
+                           heatmap_threshold=heatmap_threshold, max_fps=max_fps)
+
+    # Add a chart to track data (optional)
+    chart = ChartModule(
+        [{"Label": "Civilians", "Color": "blue"},
+         {"Label": "Military", "Color": "green"},
+         {"Label": "Terrorists", "Color": "red"}]
+    )
+
+    # Define user settable parameters
+    model_params = {
+        "num_civilians": UserSettableParameter("slider", "Number of Civilians", 100, 10, 200, 10),
+        "num_military": UserSettableParameter("slider", "Number of Military Agents", 50, 10, 100, 10),
+        "num_terrorists": UserSettableParameter("slider", "Number of Terrorists", 20, 5, 50, 5),
+        "width": width, "height": height, "sparse": sparse,
+        "crowded_areas": crowded_areas, "high_value_areas": high_value_areas,
+    }
+
+    # Create a server to run the model with visualization
+    return ModularServer(WarZoneModel, [grid, chart], "WarZoneMAS", model_params)
+
+
+def parse_areas(text):
+    # "x,y;x,y;..." -> [(x, y), ...]
+    return [tuple(int(value) for value in pair.split(",")) for pair in text.split(";")] if text else None
+
 
-# Create a CanvasGrid for visualization
-grid = CanvasGrid(agent_portrayal, grid_width, grid_height, 500, 500)
-
-# Add a chart to track data (optional)
-chart = ChartModule(
-    [{"Label": "Civilians", "Color": "blue"},
-     {"Label": "Military", "Color": "green"},
-     {"Label": "Terrorists", "Color": "red"}]
-)
-
-# Define user settable parameters
-model_params = {
-    "num_civilians": UserSettableParameter("slider", "Number of Civilians", 100, 10, 200, 10),
-    "num_military": UserSettableParameter("slider", "Number of Military Agents", 50, 10, 100, 10),
-    "num_terrorists": UserSettableParameter("slider", "Number of Terrorists", 20, 5, 50, 5)
-}
-
-# Create a server to run the model with visualization
-server = ModularServer(
-    WarZoneModel,
-    [grid, chart],
-    "WarZoneMAS",
-    # {"width": grid_width, "height": grid_height, "n_civilians": 100, "n_military": 10, "n_terrorists": 5}
-    model_params
-)
+server = create_server()
 
 if __name__ == "__main__":
-    server.port = 8521  # Default port
+    parser = argparse.ArgumentParser(description="Serve the WarZoneMAS visualization.")
+    parser.add_argument("--width", type=int, default=grid_width)
+    parser.add_argument("--height", type=int, default=grid_height)
+    parser.add_argument("--sparse", action="store_true", help="store only occupied cells, for very large maps")
+    parser.add_argument("--crowded-areas", type=parse_areas, help='"x,y;x,y;...", scaled defaults if omitted')
+    parser.add_argument("--high-value-areas", type=parse_areas, help='"x,y;...", scaled defaults if omitted')
+    parser.add_argument("--heatmap-threshold", type=int, default=2000,
+                        help="draw a density heatmap instead of agents above this many agents")
+    parser.add_argument("--max-fps", type=float, default=10, help="grid redraws per second in the browser, at most")
+    parser.add_argument("--port", type=int, default=8521)
+    args = parser.parse_args()
+    server = create_server(args.width, args.height, args.sparse, args.crowded_areas, args.high_value_areas,
+                           args.heatmap_threshold, args.max_fps)
+    server.port = args.port
     server.launch()
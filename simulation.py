@@ -7,8 +7,11 @@ if __name__ == "__main__":
     n_military = 10
     n_terrorists = 5
 
-    # Create and run the model
-    model = WarZoneModel(width, height, n_civilians, n_military, n_terrorists)
+    # Create and run the model, printing the report instead of opening a window
+    model = WarZoneModel(n_civilians, n_military, n_terrorists, width=width, height=height,
+                         report_sinks=["stdout"])
     for i in range(100):
+        if not model.running:
+            break
         print(f"Step {i}")
         model.step()
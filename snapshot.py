@@ -0,0 +1,232 @@
+import argparse
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent
+from batch import flatten_report
+from collection import CASUALTY_COLUMNS, POPULATION_COLUMNS
+from model import WarZoneModel
+from seeding import replica_seeds
+
+FORMAT_VERSION = 5
+KINDS = [CivilianAgent, MilitaryAgent, TerroristAgent]
+NO_POSITION = (-1, -1)
+
+# (map size and danger zones, Navigation) of the last snapshot restored
+_navigation = (None, None)
+
+
+def pack_random_state(generator):
+    version, internal, gauss_next = generator.getstate()
+    return np.array(internal, dtype=np.uint32), gauss_next
+
+
+def unpack_random_state(internal, gauss_next):
+    return (3, tuple(int(value) for value in internal), gauss_next)
+
+
+def collector_tables(collector):
+    return [("populations", collector.populations, POPULATION_COLUMNS),
+            ("casualties", collector.casualty_ledger, CASUALTY_COLUMNS)]
+
+
+def snapshot(model):
+    """The complete state of a WarZoneModel, as compressed bytes.
+
+    Agents are listed in schedule order, each with its rank in its grid cell,
+    so a restored model activates agents and walks cells in the same order
+    and continues exactly as the original would.
+    """
+    agents = model.schedule.agents
+    cell_rank = {}
+    for cell, x, y in model.grid.coord_iter():
+        for rank, agent in enumerate(cell):
+            cell_rank[agent.unique_id] = rank
+    squad_of = model.squads.squad_of if model.squads else {}
+    model_random, model_gauss = pack_random_state(model.random)
+    meta = {
+        "version": FORMAT_VERSION, "seed": model.seed,
+        "width": model.grid.width, "height": model.grid.height, "sparse": model.sparse,
+        "crowded_areas": model.crowded_areas, "high_value_areas": model.high_value_areas,
+        "num_civilians": model.num_civilians, "num_military": model.num_military,
+        "num_terrorists": model.num_terrorists,
+        "initial": [model.initial_civilians, model.initial_military, model.initial_terrorists],
+        "collector": model.datacollector.summary,
+        "danger_zones_created": model.danger_zones_created,
+        "steps": model.schedule.steps, "time": model.schedule.time,
+        "running": model.running, "report": model.report, "targeting": model.targeting,
+        "squads": model.squads is not None, "next_squad": model.squads.next_id if model.squads else 0,
+        "model_gauss": model_gauss,
+    }
+    arrays = {
+        "meta": np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8),
+        "unique_id": np.array([agent.unique_id for agent in agents], dtype=np.int64),
+        "kind": np.array([KINDS.index(type(agent)) for agent in agents], dtype=np.int8),
+        "pos": np.array([agent.pos for agent in agents], dtype=np.int32).reshape(-1, 2),
+        "cell_rank": np.array([cell_rank[agent.unique_id] for agent in agents], dtype=np.int32),
+        "morale_rate": np.array([getattr(agent, "morale_rate", 0) for agent in agents], dtype=np.int32),
+        "target_area": np.array([getattr(agent, "target_area", NO_POSITION) for agent in agents],
+                                dtype=np.int32).reshape(-1, 2),
+        "target": np.array([getattr(agent, "target", None) or NO_POSITION for agent in agents],
+                           dtype=np.int32).reshape(-1, 2),
+        "squad": np.array([squad_of.get(agent.unique_id, -1) for agent in agents], dtype=np.int64),
+        "danger": np.array(model.danger.positions(), dtype=np.int32).reshape(-1, 2),
+        "model_random": model_random,
+    }
+    # The collector's in-memory history; rows already streamed to disk stay there
+    for table, buffer, columns in collector_tables(model.datacollector):
+        for column in columns:
+            arrays[f"{table}/{column}"] = buffer.column(column)
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def map_options(meta):
+    areas = {name: [tuple(pos) for pos in meta[name]] for name in ("crowded_areas", "high_value_areas")}
+    return dict(width=meta["width"], height=meta["height"], sparse=meta["sparse"], **areas)
+
+
+def template_navigation(meta, danger):
+    """Flow fields for the snapshot's map, computed once and then reused by every restore of it."""
+    global _navigation
+    key = (json.dumps(map_options(meta)), danger.tobytes())
+    if _navigation[0] != key:
+        model = WarZoneModel(0, 0, 0, show_report=False, **map_options(meta))
+        model.create_danger_zones(danger)
+        _navigation = (key, model.navigation)
+    return _navigation[1]
+
+
+def restore(data, show_report=False, profile=False):
+    """Rebuild a WarZoneModel from snapshot bytes."""
+    with np.load(io.BytesIO(data)) as stored:
+        arrays = {key: stored[key] for key in stored.files}
+    meta = json.loads(arrays["meta"].tobytes())
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot version {meta['version']}")
+    model = WarZoneModel(0, 0, 0, seed=meta["seed"], show_report=show_report, profile=profile,
+                         navigation=template_navigation(meta, arrays["danger"]), targeting=meta["targeting"],
+                         squads=meta["squads"], **map_options(meta))
+    model.num_civilians, model.num_military, model.num_terrorists = (
+        meta["num_civilians"], meta["num_military"], meta["num_terrorists"])
+    model.initial_civilians, model.initial_military, model.initial_terrorists = meta["initial"]
+
+    agents = {}
+    for unique_id, kind, pos, morale_rate, target_area, target in zip(
+            arrays["unique_id"].tolist(), arrays["kind"].tolist(), arrays["pos"].tolist(),
+            arrays["morale_rate"].tolist(), arrays["target_area"].tolist(), arrays["target"].tolist()):
+        agent = KINDS[kind](unique_id, model)
+        if isinstance(agent, CivilianAgent):
+            agent.morale_rate = morale_rate
+            agent.target_area = tuple(target_area)
+        elif isinstance(agent, TerroristAgent) and tuple(target) != NO_POSITION:
+            agent.target = tuple(target)
+            model.occupancy.claim(agent.target)
+        model.add_agent(agent, tuple(pos))
+        agents[unique_id] = agent
+    # Put every cell's occupants back in their original order
+    rank = dict(zip(arrays["unique_id"].tolist(), arrays["cell_rank"].tolist()))
+    for cell, x, y in model.grid.coord_iter():
+        if len(cell) > 1:
+            cell.sort(key=lambda agent: rank[agent.unique_id])
+    # Squad ids carry over so squads keep them; members, targets and slots are worked out afresh each step
+    if model.squads:
+        for unique_id, squad in zip(arrays["unique_id"].tolist(), arrays["squad"].tolist()):
+            if squad >= 0:
+                model.squads.squad_of[unique_id] = squad
+                model.squads.members.setdefault(squad, []).append(agents[unique_id])
+        for members in model.squads.members.values():
+            for member in members:
+                member.group = members
+        model.squads.next_id = meta["next_squad"]
+
+    # The template navigation already routes around these
+    model.danger.stamp(arrays["danger"])
+    model.danger_zones_created = meta["danger_zones_created"]
+    model.schedule.steps, model.schedule.time = meta["steps"], meta["time"]
+    model.running, model.report = meta["running"], meta["report"]
+    model.datacollector.summary = meta["collector"]
+    for table, buffer, columns in collector_tables(model.datacollector):
+        for values in zip(*(arrays[f"{table}/{column}"].tolist() for column in columns)):
+            buffer.append(dict(zip(columns, values)))
+
+    # Agent construction draws random numbers, so the generator is restored last
+    model.random.setstate(unpack_random_state(arrays["model_random"], meta["model_gauss"]))
+    return model
+
+
+def reseed(model, seed):
+    """Send a restored model down its own random path."""
+    model.seed = seed
+    model.random.seed(seed)
+
+
+def fork(model, branches, seeds=None):
+    """branches in-process copies of model, reseeded with seeds when given."""
+    data = snapshot(model)
+    copies = []
+    for branch in range(branches):
+        copy = restore(data)
+        if seeds is not None:
+            reseed(copy, seeds[branch])
+        copies.append(copy)
+    return copies
+
+
+_branch_snapshot = None
+
+
+def _load_snapshot(data):
+    global _branch_snapshot
+    _branch_snapshot = data
+
+
+def run_branch(seed, max_steps, data=None):
+    """Restore the snapshot, reseed it and run it on; return its report row."""
+    model = restore(data or _branch_snapshot)
+    reseed(model, seed)
+    start = model.schedule.steps
+    while model.running and model.schedule.steps < start + max_steps:
+        model.step()
+    if model.running:
+        model.generate_report()
+    return dict(seed=seed, branched_at=start, steps=model.schedule.steps, **flatten_report(model.report))
+
+
+def run_branches(data, seeds, max_steps=1000, processes=None):
+    """Run one continuation of the snapshot per seed and return their report rows.
+
+    With processes set, each worker receives the snapshot bytes once and
+    restores a fresh model from them for every branch it runs.
+    """
+    if not processes:
+        return [run_branch(seed, max_steps, data) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_load_snapshot, initargs=(data,)) as executor:
+        return list(executor.map(run_branch, seeds, [max_steps] * len(seeds)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm a WarZoneModel up, then branch continuations from it.")
+    parser.add_argument("--civilians", type=int, default=100)
+    parser.add_argument("--military", type=int, default=50)
+    parser.add_argument("--terrorists", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=10, help="steps to run before branching")
+    parser.add_argument("--branches", type=int, default=20)
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    model = WarZoneModel(args.civilians, args.military, args.terrorists, seed=args.seed, show_report=False)
+    while model.running and model.schedule.steps < args.warmup:
+        model.step()
+    data = snapshot(model)
+    print(f"snapshot at step {model.schedule.steps}: {len(data)} bytes")
+    rows = run_branches(data, replica_seeds(args.seed, args.branches), args.max_steps, args.processes)
+    for column in ["Initial vs. Final Population/Civilians", "Initial vs. Final Population/Military",
+                   "Initial vs. Final Population/Terrorists", "steps"]:
+        print(f"{column}: {[row[column] for row in rows]}")
@@ -0,0 +1,90 @@
+from agents import TerroristAgent
+from grid import GridListener
+
+
+class TerroristIndex(GridListener):
+    """Live terrorists bucketed into square blocks of cells for nearest-neighbour queries.
+
+    A query only visits the rings of buckets around the querying cell that can
+    still hold something closer than the best match found so far.
+    """
+
+    def __init__(self, width, height, torus=False, bucket_size=4):
+        self.width = width
+        self.height = height
+        self.torus = torus
+        self.bucket_size = bucket_size
+        self.buckets_x = -(-width // bucket_size)
+        self.buckets_y = -(-height // bucket_size)
+        # On a torus the last, partial bucket lets wrapped cells sit closer than a full ring
+        self.slack = (max(self.buckets_x * bucket_size - width, self.buckets_y * bucket_size - height)
+                      if torus else 0)
+        self.buckets = {}  # (bx, by) -> {unique_id: agent}
+        self.count = 0
+
+    def bucket_of(self, pos):
+        return (pos[0] // self.bucket_size, pos[1] // self.bucket_size)
+
+    def on_place(self, agent, pos):
+        if isinstance(agent, TerroristAgent):
+            self.buckets.setdefault(self.bucket_of(pos), {})[agent.unique_id] = agent
+            self.count += 1
+
+    def on_remove(self, agent, pos):
+        if isinstance(agent, TerroristAgent):
+            key = self.bucket_of(pos)
+            bucket = self.buckets[key]
+            del bucket[agent.unique_id]
+            if not bucket:
+                del self.buckets[key]
+            self.count -= 1
+
+    def on_move(self, agent, old_pos, new_pos):
+        if isinstance(agent, TerroristAgent) and self.bucket_of(old_pos) != self.bucket_of(new_pos):
+            self.on_remove(agent, old_pos)
+            self.on_place(agent, new_pos)
+
+    def distance(self, pos1, pos2):
+        # Manhattan distance, taking the short way round when the grid wraps
+        dx = abs(pos1[0] - pos2[0])
+        dy = abs(pos1[1] - pos2[1])
+        if self.torus:
+            dx = min(dx, self.width - dx)
+            dy = min(dy, self.height - dy)
+        return dx + dy
+
+    def nearest(self, pos):
+        """Return the closest live terrorist to pos, or None if there are none.
+
+        Ties go to the lowest unique_id, which is the schedule order.
+        """
+        if not self.count:
+            return None
+        bx, by = self.bucket_of(pos)
+        best = None
+        best_key = None
+        seen = set()
+        for ring in range(max(self.buckets_x, self.buckets_y) + 1):
+            if best is not None and (ring - 1) * self.bucket_size + 1 - self.slack > best_key[0]:
+                break
+            for key in self.ring(bx, by, ring):
+                if key in seen:
+                    continue
+                seen.add(key)
+                for unique_id, agent in self.buckets.get(key, {}).items():
+                    agent_key = (self.distance(pos, agent.pos), unique_id)
+                    if best_key is None or agent_key < best_key:
+                        best, best_key = agent, agent_key
+        return best
+
+    def ring(self, bx, by, ring):
+        # Buckets whose Chebyshev distance from (bx, by) is exactly ring
+        for dx in range(-ring, ring + 1):
+            for dy in range(-ring, ring + 1):
+                if max(abs(dx), abs(dy)) != ring:
+                    continue
+                x, y = bx + dx, by + dy
+                if self.torus:
+                    yield (x % self.buckets_x, y % self.buckets_y)
+                elif 0 <= x < self.buckets_x and 0 <= y < self.buckets_y:
+                    yield (x, y)
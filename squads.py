@@ -0,0 +1,140 @@
+from agents import MilitaryAgent
+
+# The 8 cells around a terrorist, which a squad tries to fill
+RING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+class Squads:
+    """Military agents clustered into squads once per step, each squad hunting one terrorist.
+
+    Soldiers within radius cells of each other (the range form_group used)
+    are joined with union-find, closest pairs first, into squads of at most
+    size soldiers. Members of last step's squads that are still in range are
+    joined before anyone else, so squads hold together and keep their ids
+    from step to step. Each squad chases the terrorist nearest its leader,
+    and its members head for different cells around it.
+    """
+
+    def __init__(self, width, height, radius=2, size=4):
+        self.width = width
+        self.height = height
+        self.size = size
+        # Offsets to the cells in range, nearest first, one of each +/- pair
+        self.offsets = sorted(((dx, dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1)
+                               if (dx, dy) > (0, 0)), key=lambda offset: max(abs(offset[0]), abs(offset[1])))
+        self.squad_of = {}  # unique_id -> squad id
+        self.members = {}  # squad id -> soldiers, leader first
+        self.targets = {}  # squad id -> terrorist being hunted
+        self.slots = {}  # unique_id -> offset from the target to head for
+        self.next_id = 0
+
+    def update(self, model):
+        soldiers = list(model.agents_by_type[MilitaryAgent].values())
+        parent = {soldier.unique_id: soldier.unique_id for soldier in soldiers}
+        size = dict.fromkeys(parent, 1)
+
+        def find(uid):
+            while parent[uid] != uid:
+                parent[uid] = parent[parent[uid]]
+                uid = parent[uid]
+            return uid
+
+        def union(first, second):
+            first, second = find(first), find(second)
+            if first != second and size[first] + size[second] <= self.size:
+                if first > second:
+                    first, second = second, first
+                parent[second] = first
+                size[first] += size[second]
+
+        pairs = self.pairs(soldiers)
+        for first, second in pairs:
+            previous = self.squad_of.get(first)
+            if previous is not None and previous == self.squad_of.get(second):
+                union(first, second)
+        for first, second in pairs:
+            union(first, second)
+
+        clusters = {}
+        for soldier in soldiers:
+            clusters.setdefault(find(soldier.unique_id), []).append(soldier)
+        self.assign_ids(clusters.values())
+        self.slots = {}
+        for squad, members in self.members.items():
+            target = model.terrorists.nearest(members[0].pos)
+            self.targets[squad] = target
+            if target:
+                self.assign_slots(members, target.pos)
+            for member in members:
+                member.group = members
+
+    def pairs(self, soldiers):
+        """Pairs of soldiers in range of each other, nearest first."""
+        by_cell = {}
+        for soldier in soldiers:
+            by_cell.setdefault(soldier.pos, []).append(soldier.unique_id)
+        pairs = [(first, second) for cell in by_cell.values()
+                 for index, first in enumerate(cell) for second in cell[index + 1:]]
+        for dx, dy in self.offsets:
+            for (x, y), cell in by_cell.items():
+                other = by_cell.get(((x + dx) % self.width, (y + dy) % self.height))
+                if other:
+                    pairs.extend((first, second) for first in cell for second in other)
+        return pairs
+
+    def assign_ids(self, clusters):
+        """Give each cluster the id most of its members had, or a new one."""
+        self.members, self.targets = {}, {}
+        squad_of = {}
+        for members in sorted(clusters, key=len, reverse=True):
+            votes = {}
+            for member in members:
+                previous = self.squad_of.get(member.unique_id)
+                if previous is not None and previous not in self.members:
+                    votes[previous] = votes.get(previous, 0) + 1
+            if votes:
+                squad = min(votes, key=lambda previous: (-votes[previous], previous))
+            else:
+                squad = self.next_id
+                self.next_id += 1
+            self.members[squad] = members
+            for member in members:
+                squad_of[member.unique_id] = squad
+        self.squad_of = squad_of
+
+    def assign_slots(self, members, target):
+        """Send each member to its own cell around target, nearest members choosing first."""
+        def distance(member, offset):
+            return abs(target[0] + offset[0] - member.pos[0]) + abs(target[1] + offset[1] - member.pos[1])
+
+        free = list(RING_OFFSETS)
+        for member in sorted(members, key=lambda member: distance(member, (0, 0))):
+            if free:
+                offset = min(free, key=lambda offset: distance(member, offset))
+                free.remove(offset)
+            else:
+                offset = (0, 0)
+            self.slots[member.unique_id] = offset
+
+    def target_of(self, soldier):
+        """The position of the terrorist soldier's squad is hunting, or None when none are left.
+
+        When the squad's terrorist dies mid-step, the squad switches to the one
+        nearest this soldier.
+        """
+        squad = self.squad_of.get(soldier.unique_id)
+        target = self.targets.get(squad)
+        if target is None or target.pos is None:
+            target = soldier.model.terrorists.nearest(soldier.pos)
+            if squad is not None:
+                self.targets[squad] = target
+                self.slots.pop(soldier.unique_id, None)
+        return target.pos if target else None
+
+    def slot_of(self, soldier, target):
+        """The cell around target that soldier should head for."""
+        dx, dy = self.slots.get(soldier.unique_id, (0, 0))
+        slot = (target[0] + dx, target[1] + dy)
+        if soldier.model.grid.out_of_bounds(slot):
+            return target
+        return slot
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+def nearest_source(width, height, source_x, source_y):
+    """For every cell, the index of the closest source and the Manhattan distance to it.
+
+    This is an exact L1 distance transform done as a forward and a backward sweep
+    along each axis, so it costs O(width * height) however many sources and
+    queries there are.
+    Cells get label -1 when there are no sources.
+    """
+    distance = np.full((width, height), width + height, dtype=np.int32)
+    label = np.full((width, height), -1, dtype=np.int32)
+    # Assign in reverse so the lowest index wins when sources share a cell
+    order = np.arange(len(source_x))[::-1]
+    distance[source_x[order], source_y[order]] = 0
+    label[source_x[order], source_y[order]] = order
+    for axis in (1, 0):
+        _sweep(distance, label, axis)
+    return label, distance
+
+
+def _sweep(distance, label, axis):
+    # One-dimensional distance transform of every line along axis, forwards then
+    # backwards: d[i] = min over j of d[j] + |i - j|, via a running minimum of d[j] - j
+    shape = [1] * distance.ndim
+    shape[axis] = -1
+    index = np.arange(distance.shape[axis], dtype=np.int32).reshape(shape)
+    for lines, labels in ((distance, label), (np.flip(distance, axis), np.flip(label, axis))):
+        offset = lines - index
+        best = np.minimum.accumulate(offset, axis=axis)
+        source = np.maximum.accumulate(np.where(offset == best, index, 0), axis=axis)
+        labels[...] = np.take_along_axis(labels, source, axis)
+        lines[...] = best + index
+
+
+def greedy_assignment(width, height, x, y, candidates, max_rounds=None):
+    """Give the terrorists at (x, y) distinct target cells out of the candidates mask.
+
+    Each round every terrorist still without a target picks its nearest free
+    candidate. Where several pick the same cell the closest one, then the first
+    listed, gets it, and the others try again next round. A round costs one
+    distance transform of the map, however many terrorists there are. Returns
+    target x and y arrays, with -1 for terrorists left without a cell after
+    max_rounds rounds or once the candidates run out.
+    """
+    candidates = candidates.copy()
+    target_x = np.full(len(x), -1)
+    target_y = np.full(len(x), -1)
+    pending = np.arange(len(x))
+    rounds = 0
+    while len(pending) and (max_rounds is None or rounds < max_rounds):
+        cell_x, cell_y = np.nonzero(candidates)
+        if not len(cell_x):
+            break
+        label, distance = nearest_source(width, height, cell_x, cell_y)
+        choice = label[x[pending], y[pending]]
+        order = np.lexsort((pending, distance[x[pending], y[pending]]))
+        _, first = np.unique(choice[order], return_index=True)
+        winners = order[first]
+        target_x[pending[winners]] = cell_x[choice[winners]]
+        target_y[pending[winners]] = cell_y[choice[winners]]
+        candidates[cell_x[choice[winners]], cell_y[choice[winners]]] = False
+        pending = np.delete(pending, winners)
+        rounds += 1
+    return target_x, target_y
+
+
+def optimal_assignment(width, height, x, y, candidates, max_rounds=None):
+    """Distinct target cells for the terrorists at (x, y) with the least total Manhattan distance.
+
+    Solved exactly with scipy's linear_sum_assignment over a terrorists by
+    candidates cost matrix, so it needs scipy and memory for that matrix.
+    Takes the same arguments as greedy_assignment; max_rounds is ignored.
+    """
+    try:
+        from scipy.optimize import linear_sum_assignment
+    except ImportError:
+        raise ImportError('targeting="optimal" needs scipy, which is optional: pip install scipy') from None
+    target_x = np.full(len(x), -1)
+    target_y = np.full(len(x), -1)
+    cell_x, cell_y = np.nonzero(candidates)
+    if len(x) and len(cell_x):
+        cost = np.abs(x[:, None] - cell_x) + np.abs(y[:, None] - cell_y)
+        rows, columns = linear_sum_assignment(cost)
+        target_x[rows] = cell_x[columns]
+        target_y[rows] = cell_y[columns]
+    return target_x, target_y
+
+
+ASSIGNMENTS = {"greedy": greedy_assignment, "optimal": optimal_assignment}
@@ -0,0 +1,16 @@
+import pytest
+
+from engines import compare_engines
+
+# The default populations, a crowded map and one where the military are outnumbered
+POPULATIONS = [(100, 50, 20), (200, 100, 50), (150, 20, 30)]
+
+
+@pytest.mark.parametrize("num_civilians, num_military, num_terrorists", POPULATIONS)
+def test_array_engine_matches_object_engine(num_civilians, num_military, num_terrorists):
+    assert compare_engines(num_civilians, num_military, num_terrorists, engines=("object", "array"))
+
+
+@pytest.mark.parametrize("num_civilians, num_military, num_terrorists", POPULATIONS)
+def test_parallel_engine_matches_array_engine(num_civilians, num_military, num_terrorists):
+    assert compare_engines(num_civilians, num_military, num_terrorists, engines=("array", "parallel"))
@@ -0,0 +1,29 @@
+import random
+
+import pytest
+
+from danger import DangerLayer
+from navigation import Navigation
+
+WIDTH, HEIGHT = 23, 17
+TARGETS = [(0, 0), (11, 8), (22, 16), (5, 12)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_blocking_matches_a_rebuild(seed):
+    rng = random.Random(seed)
+    danger = DangerLayer(WIDTH, HEIGHT)
+    navigation = Navigation(WIDTH, HEIGHT, danger)
+    navigation.precompute(TARGETS)
+    for _ in range(8):
+        # Blast-sized clusters and scattered cells, sometimes over a target or already blocked ones
+        x, y = rng.randrange(WIDTH), rng.randrange(HEIGHT)
+        cluster = [((x + dx) % WIDTH, (y + dy) % HEIGHT) for dx in range(-1, 2) for dy in range(-1, 2)]
+        scattered = [(rng.randrange(WIDTH), rng.randrange(HEIGHT)) for _ in range(rng.randrange(6))]
+        navigation.block(danger.stamp(cluster + scattered))
+
+        rebuilt = Navigation(WIDTH, HEIGHT, danger)
+        rebuilt.precompute(TARGETS)
+        for target in TARGETS:
+            assert navigation.field(target).distance == rebuilt.field(target).distance
+            assert navigation.field(target).next_cell == rebuilt.field(target).next_cell
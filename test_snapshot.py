@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from collection import CASUALTY_COLUMNS
+from model import WarZoneModel
+from snapshot import fork, restore, snapshot
+
+CONFIGURATIONS = {
+    "default": {},
+    "no-squads": {"squads": False},
+    "sequential": {"targeting": "sequential"},
+    "sparse": {"sparse": True},
+}
+
+
+def collected(model):
+    collector = model.datacollector
+    ledger = {column: collector.casualty_ledger.column(column).tolist() for column in CASUALTY_COLUMNS}
+    return collector.model_vars, ledger, collector.summary
+
+
+def positions(model):
+    return sorted((agent.unique_id, agent.pos) for agent in model.schedule.agents)
+
+
+def run(model, steps):
+    for _ in range(steps):
+        if model.running:
+            model.step()
+
+
+@pytest.mark.parametrize("options", CONFIGURATIONS.values(), ids=CONFIGURATIONS.keys())
+@pytest.mark.parametrize("seed", [0, 1])
+def test_restored_model_continues_identically(options, seed):
+    model = WarZoneModel(200, 100, 50, seed=seed, show_report=False, **options)
+    run(model, 5)
+    copy = restore(snapshot(model))
+    assert copy.seed == model.seed
+    run(model, 30)
+    run(copy, 30)
+    assert copy.schedule.steps == model.schedule.steps
+    assert positions(copy) == positions(model)
+    assert collected(copy) == collected(model)
+    assert np.array_equal(copy.danger.cells, model.danger.cells)
+
+
+def test_forks_match_each_other():
+    model = WarZoneModel(200, 100, 50, seed=3, show_report=False)
+    run(model, 5)
+    first, second = fork(model, 2)
+    run(first, 30)
+    run(second, 30)
+    assert positions(first) == positions(second)
+    assert collected(first) == collected(second)
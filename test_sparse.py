@@ -0,0 +1,26 @@
+import pytest
+
+from collection import CASUALTY_COLUMNS
+from model import WarZoneModel
+from navigation import DirectNavigation
+
+
+def trajectory(model, steps):
+    states = []
+    while model.running and model.schedule.steps < steps:
+        model.step()
+        states.append((sorted((agent.unique_id, agent.pos) for agent in model.schedule.agents),
+                       model.danger.positions()))
+    ledger = {column: model.datacollector.casualty_ledger.column(column).tolist() for column in CASUALTY_COLUMNS}
+    return states, model.datacollector.model_vars, ledger
+
+
+@pytest.mark.parametrize("width, height", [(30, 30), (45, 20)])
+@pytest.mark.parametrize("seed", range(3))
+def test_sparse_grid_matches_dense_grid(seed, width, height):
+    # The dense model is given what the sparse one uses: straight steps and sequential targeting
+    options = dict(seed=seed, show_report=False, width=width, height=height, targeting="sequential",
+                   danger_zones=[(3, 4), (3, 5), (10, 10), (0, height - 1)])
+    dense = WarZoneModel(200, 100, 50, navigation=DirectNavigation(width, height), **options)
+    sparse = WarZoneModel(200, 100, 50, sparse=True, **options)
+    assert trajectory(sparse, 60) == trajectory(dense, 60)
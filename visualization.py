@@ -0,0 +1,116 @@
+import base64
+import json
+
+import numpy as np
+from mesa.visualization.ModularVisualization import VisualizationElement
+
+from agents import CivilianAgent, MilitaryAgent, TerroristAgent, OrangeCell
+
+# What a cell can hold, bottom layer first; cell codes have bit i set when it holds LAYERS[i]
+LAYERS = [OrangeCell, CivilianAgent, MilitaryAgent, TerroristAgent]
+# Heatmap intensities run from 0 (nothing there) to LEVELS - 1
+LEVELS = 16
+
+
+def sample(kind):
+    # An uninitialised instance, enough for a portrayal method that only checks the type
+    return OrangeCell((0, 0)) if kind is OrangeCell else kind.__new__(kind)
+
+
+class DeltaCanvasGrid(VisualizationElement):
+    """A CanvasGrid that sends the browser only what changed since the last frame it drew.
+
+    Each cell is sent as a code saying which of LAYERS it holds, drawn with the
+    styles portrayal_method gives each type, and a frame lists only the cells
+    whose code changed. Above heatmap_threshold agents the frames switch to a
+    heatmap: for each type, a log-scaled count of agents per block of cells,
+    at most heatmap_bins blocks along the longer side, again sending only the
+    blocks that changed. Every step's frame is sent; the browser keeps the
+    changes and redraws at most max_fps times a second, drawing what is
+    still pending once the model pauses. The browser's picture is tied to
+    the one model it was drawn from, so the server should have a single
+    viewer.
+    """
+
+    local_includes = ["delta_canvas.js"]
+
+    def __init__(self, portrayal_method, grid_width, grid_height, canvas_width=500, canvas_height=500,
+                 heatmap_threshold=2000, heatmap_bins=100, max_fps=10):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.heatmap_threshold = heatmap_threshold
+        self.layer_of = {kind: layer for layer, kind in enumerate(LAYERS)}
+        self.bits = {kind: 1 << layer for kind, layer in self.layer_of.items()}
+        self.bin_size = -(-max(grid_width, grid_height) // heatmap_bins)
+        self.bins = (-(-grid_width // self.bin_size), -(-grid_height // self.bin_size))
+        styles = [portrayal_method(sample(kind)) for kind in LAYERS]
+        self.js_code = "elements.push(new DeltaCanvasModule({}, {}, {}, {}, {}, {}));".format(
+            canvas_width, canvas_height, grid_width, grid_height, json.dumps(styles), max_fps)
+        self.model = None
+        self.mode = None
+
+    def render(self, model):
+        mode = "heatmap" if len(model.schedule.agents) > self.heatmap_threshold else "cells"
+        full = model is not self.model or mode != self.mode
+        if model is not self.model:
+            self.model = model
+            self.danger = (None, [])
+        self.mode = mode
+        if mode == "cells":
+            return self.cell_frame(model, full)
+        return self.heatmap_frame(model, full)
+
+    def danger_positions(self, model):
+        # Danger zones only change with a blast, so they are listed again only when the count moves
+        if self.danger[0] != model.danger.count:
+            self.danger = (model.danger.count, model.danger.positions())
+        return self.danger[1]
+
+    def cell_codes(self, model):
+        codes = dict.fromkeys(self.danger_positions(model), self.bits[OrangeCell])
+        for agent in model.schedule.agents:
+            codes[agent.pos] = codes.get(agent.pos, 0) | self.bits[type(agent)]
+        return codes
+
+    def cell_frame(self, model, full):
+        codes = self.cell_codes(model)
+        previous = {} if full else self.codes
+        changed = [(pos, code) for pos, code in codes.items() if previous.get(pos) != code]
+        changed += [(pos, 0) for pos in previous if pos not in codes]
+        self.codes = codes
+        return {"mode": "cells", "full": full, "cells": [value for (x, y), code in changed for value in (x, y, code)]}
+
+    def heat_levels(self, model):
+        """LEVELS-step intensities per block, one row per layer."""
+        bins_x, bins_y = self.bins
+        positions = [[] for _ in LAYERS]
+        positions[0] = self.danger_positions(model)
+        for agent in model.schedule.agents:
+            positions[self.layer_of[type(agent)]].append(agent.pos)
+        levels = np.zeros((len(LAYERS), bins_x * bins_y), dtype=np.uint8)
+        for layer, cells in enumerate(positions):
+            if not cells:
+                continue
+            x, y = np.array(cells).T // self.bin_size
+            counts = np.bincount(x * bins_y + y, minlength=bins_x * bins_y)
+            if LAYERS[layer] is OrangeCell:
+                # The share of the block that is danger zone
+                level = np.ceil((LEVELS - 1) * counts / self.bin_size ** 2)
+            else:
+                # 1, 2-3, 4-7, ... agents, so small changes in a crowd don't redraw it
+                level = np.ceil(np.log2(counts + 1))
+            levels[layer] = np.minimum(level, LEVELS - 1)
+        return levels
+
+    def heatmap_frame(self, model, full):
+        levels = self.heat_levels(model)
+        frame = {"mode": "heatmap", "full": full, "bins": self.bins, "bin_size": self.bin_size, "levels": LEVELS}
+        if full:
+            frame["layers"] = [base64.b64encode(layer.tobytes()).decode() for layer in levels]
+        else:
+            frame["layers"] = []
+            for layer, previous in zip(levels, self.levels):
+                changed = np.flatnonzero(layer != previous)
+                frame["layers"].append([changed.tolist(), layer[changed].tolist()])
+        self.levels = levels
+        return frame